@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from drummerei.models.schedule import Schedule
+
+
+def schedule_not_modified(
+    request,
+    response:HttpResponse,
+    schedule:Schedule,
+    now:datetime|None=None,
+    variant:str|None=None,
+) -> HttpResponse|None:
+    """
+    Sets the validators of a schedule resource and answers revalidations.
+
+    Every write to a schedule or one of its slots increments the schedule
+    version and updates its modification time, so both describe every
+    resource below the schedule.
+
+    Args:
+        request (HttpRequest): The request to answer.
+        response (HttpResponse): The temporal response of the operation.
+        schedule (Schedule): The schedule the resource belongs to.
+        now (datetime, optional): The start of the minute slot states were
+            computed for, for resources that include them.
+        variant (str, optional): Identifies the representation, e.g. the
+            selected fields.
+
+    Returns:
+        HttpResponse|None: A 304 response if the client's copy is current,
+            None if the resource has to be serialized.
+    """
+    etag = "-".join(
+        str(part) for part in (
+            schedule.id,
+            schedule.version,
+            now.strftime("%Y%m%d%H%M") if now else None,
+            variant,
+        )
+        if part is not None
+    )
+    etag = f'"{etag}"'
+    last_modified = schedule.modified.timestamp()
+    if now is not None:
+        last_modified = max(last_modified, now.timestamp())
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    for headers in (response, not_modified):
+        if headers is not None:
+            headers["ETag"] = etag
+            headers["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(headers, no_cache=True)
+    return not_modified
@@ -0,0 +1,83 @@
+import base64
+import binascii
+from datetime import datetime
+from math import inf
+from typing import Any, List, Optional
+
+from django.db.models import Q, QuerySet
+
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+
+
+class KeysetPagination(AsyncPaginationBase):
+    """
+    Paginates schedules by (start_time, id) instead of by offset.
+
+    Every page is a range scan on the (start_time, id) index, so late pages
+    cost as much as the first one. Clients pass the `next` cursor of a page
+    to get the following page; it is None on the last page.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        limit: int = Field(
+            settings.PAGINATION_PER_PAGE,
+            ge=1,
+            le=settings.PAGINATION_MAX_LIMIT
+            if settings.PAGINATION_MAX_LIMIT != inf
+            else None,
+        )
+
+    class Output(Schema):
+        items: List[Any]
+        next: Optional[str]
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        page = self.page_queryset(queryset, pagination)
+        return self.page(list(page), pagination)
+
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        page = self.page_queryset(queryset, pagination)
+        return self.page([item async for item in page], pagination)
+
+    def page_queryset(self, queryset: QuerySet, pagination: Input) -> QuerySet:
+        queryset = queryset.order_by("start_time", "id")
+        if pagination.cursor:
+            start_time, id = decode_cursor(pagination.cursor)
+            queryset = queryset.filter(
+                Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=id)
+            )
+        # one extra row tells whether there is a next page
+        return queryset[: pagination.limit + 1]
+
+    def page(self, items: list, pagination: Input) -> dict:
+        next = None
+        if len(items) > pagination.limit:
+            items = items[: pagination.limit]
+            next = encode_cursor(items[-1].start_time, items[-1].id)
+        return {"items": items, "next": next}
+
+
+def encode_cursor(start_time:datetime, id:int) -> str:
+    return base64.urlsafe_b64encode(f"{start_time.isoformat()}|{id}".encode()).decode()
+
+
+def decode_cursor(cursor:str) -> tuple[datetime, int]:
+    try:
+        start_time, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_time), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HttpError(400, "Invalid cursor")
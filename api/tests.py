@@ -1,10 +1,9 @@
 from datetime import datetime, timedelta
 import json
+from asgiref.sync import sync_to_async
 from django.test import TestCase
-from ninja.testing import TestClient
 
 from drummerei.models.schedule import Schedule
-from api.views.slots import router
 
 
 class ApiTest(TestCase):
@@ -17,12 +16,13 @@ class ApiTest(TestCase):
             start_time=self.start_time,
             end_time=self.end_time
         )
-        self.client = TestClient(router)
+        self.path = f'/api/schedules/{self.schedule.id}/slots'
+        self.slot = self.schedule.slots.first()
 
 
     def test_reserve(self):
         response = self.client.patch(
-            '1/slots/1/reserve',
+            f'{self.path}/{self.slot.id}/reserve',
             data=json.dumps({
                 "name": "TestDJ",
                 "pin": self.schedule.pin,
@@ -33,10 +33,24 @@ class ApiTest(TestCase):
         self.assertEqual(self.schedule.slots.first().name, self.name)
         self.assertEqual(response.json()["name"], self.name)
 
+    def test_reserve_conflict(self):
+        for name in ("TestDJ", "OtherDJ"):
+            response = self.client.patch(
+                f'{self.path}/{self.slot.id}/reserve',
+                data=json.dumps({
+                    "name": name,
+                    "pin": self.schedule.pin,
+                    }),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.schedule.slots.first().name, self.name)
+
  
     def test_clear(self):
         response = self.client.patch(
-            '1/slots/1/clear',
+            f'{self.path}/{self.slot.id}/clear',
             data=json.dumps({
                 "pin": self.schedule.pin,
                 }),
@@ -45,3 +59,202 @@ class ApiTest(TestCase):
 
         self.assertEqual(self.schedule.slots.first().name, None)
         self.assertEqual(response.json()["name"], None)
+
+    async def test_reserve_async(self):
+        response = await self.async_client.patch(
+            f'{self.path}/{self.slot.id}/reserve',
+            data=json.dumps({
+                "name": self.name,
+                "pin": self.schedule.pin,
+                }),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        slot = await self.schedule.slots.afirst()
+        self.assertEqual(slot.name, self.name)
+        response = await self.async_client.get(self.path)
+        self.assertEqual(response.json()[0]["name"], self.name)
+        self.assertEqual(response.resolver_match.namespace, "api-async")
+
+    async def test_errors_async(self):
+        response = await self.async_client.patch(
+            f'{self.path}/{self.slot.id}/clear',
+            data=json.dumps({"pin": self.schedule.pin + 1}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.patch(
+            f'{self.path}/0/reserve',
+            data=json.dumps({"name": self.name, "pin": self.schedule.pin}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_entry_points(self):
+        # WSGI requests are served by the sync handlers
+        response = await sync_to_async(self.client.get)(self.path)
+        self.assertEqual(response.resolver_match.namespace, "api-0.1.0")
+
+        # both describe the same API
+        openapi = await sync_to_async(self.client.get)("/api/openapi.json")
+        async_openapi = await self.async_client.get("/api/openapi.json")
+        self.assertEqual(async_openapi.resolver_match.namespace, "api-async")
+        self.assertEqual(async_openapi.json()["paths"], openapi.json()["paths"])
+
+    def test_get_slots_not_modified(self):
+        path = self.path
+        response = self.client.get(path)
+        etag = response["ETag"]
+
+        response = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.client.patch(
+            f'{self.path}/{self.slot.id}/reserve',
+            data=json.dumps({
+                "name": self.name,
+                "pin": self.schedule.pin,
+                }),
+            content_type='application/json'
+        )
+        response = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_batch(self):
+        first, second, third = self.schedule.slots.all()[:3]
+        second.reserve("OldDJ")
+
+        # one conditional UPDATE for the free slots, one for the cleared slot
+        with self.assertNumQueries(8):
+            response = self.client.patch(
+                self.path,
+                data=json.dumps({
+                    "pin": self.schedule.pin,
+                    "operations": [
+                        {"op": "reserve", "id": first.id, "name": self.name},
+                        {"op": "clear", "id": second.id},
+                        {"op": "reserve", "id": second.id, "name": "OtherDJ"},
+                        {"op": "reserve", "id": third.id, "name": "ThirdDJ"},
+                        {"op": "rename", "id": third.id, "name": "RenamedDJ"},
+                    ],
+                    }),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [slot["name"] for slot in response.json()],
+            [self.name, "OtherDJ", "RenamedDJ"],
+        )
+        self.assertEqual(
+            list(self.schedule.slots.values_list("name", flat=True)[:3]),
+            [self.name, "OtherDJ", "RenamedDJ"],
+        )
+
+    def test_batch_is_atomic(self):
+        first, second = self.schedule.slots.all()[:2]
+        second.reserve("OldDJ")
+
+        response = self.client.patch(
+            self.path,
+            data=json.dumps({
+                "pin": self.schedule.pin,
+                "operations": [
+                    {"op": "reserve", "id": first.id, "name": self.name},
+                    {"op": "reserve", "id": second.id, "name": self.name},
+                ],
+                }),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        first.refresh_from_db()
+        self.assertIsNone(first.name)
+
+
+class ScheduleListApiTest(TestCase):
+    def setUp(self):
+        self.start_time = datetime.now() - timedelta(weeks=2)
+        self.schedules = [
+            Schedule.objects.create(
+                start_time=self.start_time + timedelta(weeks=week),
+                end_time=self.start_time + timedelta(weeks=week, hours=4),
+            )
+            for week in range(5)
+        ]
+
+    def test_keyset_pagination(self):
+        ids = []
+        cursor = None
+        while True:
+            path = "/api/schedules?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            with self.assertNumQueries(2):
+                page = self.client.get(path).json()
+            ids += [schedule["id"] for schedule in page["items"]]
+            cursor = page["next"]
+            if cursor is None:
+                break
+
+        self.assertEqual(ids, [schedule.id for schedule in self.schedules])
+        self.assertEqual(
+            self.client.get("/api/schedules?limit=1").json()["items"][0]["slots"],
+            list(self.schedules[0].slots.values_list("id", flat=True)),
+        )
+
+    def test_filters(self):
+        first, second, third = self.schedules[1:4]
+        page = self.client.get(f"/api/schedules?from={first.date}&to={third.date}").json()
+        self.assertEqual([item["id"] for item in page["items"]], [first.id, second.id, third.id])
+
+        page = self.client.get("/api/schedules?upcoming=true").json()
+        self.assertEqual([item["id"] for item in page["items"]], [schedule.id for schedule in self.schedules[2:]])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/schedules?cursor=invalid").status_code, 400)
+
+
+class LineupApiTest(TestCase):
+    def setUp(self):
+        self.start_time = datetime.now() - timedelta(minutes=45)
+        self.schedule = Schedule.objects.create(
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=4),
+        )
+        self.schedule.slots.all()[3].reserve("TestDJ")
+        self.path = f"/api/schedules/{self.schedule.id}/lineup"
+
+    def test_by_id_and_date(self):
+        with self.assertNumQueries(2):
+            lineup = self.client.get(self.path).json()
+
+        self.assertEqual(lineup["id"], self.schedule.id)
+        self.assertEqual(lineup, self.client.get(f"/api/schedules/{self.schedule.date}/lineup").json())
+        self.assertEqual(
+            [slot["id"] for slot in lineup["slots"]],
+            list(self.schedule.slots.values_list("id", flat=True)),
+        )
+        statuses = [slot["status"] for slot in lineup["slots"]]
+        self.assertEqual(statuses[0], "locked")
+        self.assertEqual(statuses[3], "reserved")
+        self.assertIn("available", statuses)
+
+    def test_sparse_fields(self):
+        lineup = self.client.get(f"{self.path}?fields=start_time,name").json()
+        self.assertEqual(set(lineup["slots"][3]), {"start_time", "name"})
+        self.assertEqual(lineup["slots"][3]["name"], "TestDJ")
+
+        self.assertEqual(self.client.get(f"{self.path}?fields=start_time,pin").status_code, 400)
+
+    def test_not_found(self):
+        for reference in ("0", "2001-01-01", "tonight"):
+            self.assertEqual(self.client.get(f"/api/schedules/{reference}/lineup").status_code, 404)
+
+    def test_not_modified(self):
+        response = self.client.get(f"{self.path}?fields=name")
+        self.assertNotEqual(response["ETag"], self.client.get(self.path)["ETag"])
+
+        response = self.client.get(f"{self.path}?fields=name", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
@@ -1,11 +1,16 @@
+import inspect
+import sys
+
 from django.urls import path
 
 from ninja import NinjaAPI
 
+from .views.schedules import async_router as async_schedule_router
 from .views.schedules import router as schedule_router
+from .views.slots import async_router as async_slot_router
 from .views.slots import router as slot_router
 
-app = NinjaAPI(
+API_OPTIONS = dict(
     title="drummerei API",
     version="0.1.0",
     description="API for the drummerei app.",
@@ -19,9 +24,41 @@ app = NinjaAPI(
    },
 )
 
+
+class AsyncNinjaAPI(NinjaAPI):
+    """
+    The API with the async handlers, served to requests that came in through
+    ASGI, see core.middleware.AsgiUrlconfMiddleware.
+
+    Its operations are named and described after the sync handlers, e.g.
+    get_all_slots for aget_all_slots, so both APIs have the same schema.
+    """
+
+    def add_router(self, prefix: str, router, **kwargs) -> None:
+        for path_view in router.path_operations.values():
+            for operation in path_view.operations:
+                module = operation.view_func.__module__
+                name = operation.view_func.__name__.removeprefix("a")
+                operation.operation_id = f"{module}_{name}".replace(".", "_")
+                operation.summary = name.title().replace("_", " ")
+                operation.description = inspect.cleandoc(
+                    getattr(sys.modules[module], name).__doc__ or ""
+                )
+        super().add_router(prefix, router, **kwargs)
+
+
+app = NinjaAPI(**API_OPTIONS)
 app.add_router("/schedules", schedule_router)
 app.add_router("/schedules/", slot_router)
 
+async_app = AsyncNinjaAPI(urls_namespace="api-async", **API_OPTIONS)
+async_app.add_router("/schedules", async_schedule_router)
+async_app.add_router("/schedules/", async_slot_router)
+
 urlpatterns = [
     path('', app.urls),
 ]
+
+async_urlpatterns = [
+    path('', async_app.urls),
+]
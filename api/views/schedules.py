@@ -1,25 +1,214 @@
-from django.shortcuts import get_object_or_404
+from datetime import date, datetime, time, timedelta
 
-from ninja import ModelSchema, Router
-from typing import List
+from django.db.models import Prefetch, aprefetch_related_objects, prefetch_related_objects
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.utils import timezone
+
+from ninja import Field, ModelSchema, Query, Router, Schema
+from ninja.errors import HttpError
+from ninja.pagination import paginate
+from typing import List, Optional
 
 from drummerei.models.schedule import Schedule
+from drummerei.models.slot import Slot
+
+from ..conditional import schedule_not_modified
+from ..pagination import KeysetPagination
 
+# the sync handlers serve WSGI, the async ones ASGI, see api.urls
 router = Router(tags=["Resources"],)
+async_router = Router(tags=["Resources"],)
 
 class ScheduleSchema(ModelSchema):
     class Config:
         title= "Schedule"
         model = Schedule
         model_fields = "__all__"
+    slots: List[int]
+
+    @staticmethod
+    def resolve_slots(obj: Schedule) -> List[int]:
+        return [slot.id for slot in obj.slots.all()]
+
+
+# the slot ids are fetched with one query for all schedules, before
+# serialization, which can't query the database in async views
+SLOT_IDS = Prefetch("slots", queryset=Slot.objects.only("id", "schedule"))
+
+
+class ScheduleFilterSchema(Schema):
+    class Config:
+        title= "Schedule filter"
+    date_from: Optional[date] = Field(None, alias="from")
+    date_to: Optional[date] = Field(None, alias="to")
+    upcoming: bool = False
+
 
+def filter_schedules(filters: ScheduleFilterSchema):
+    schedules = Schedule.objects.prefetch_related(SLOT_IDS)
+    if filters.date_from:
+        schedules = schedules.filter(date__gte=filters.date_from)
+    if filters.date_to:
+        schedules = schedules.filter(date__lte=filters.date_to)
+    if filters.upcoming:
+        schedules = schedules.filter(end_time__gte=timezone.now())
+    return schedules
 
 @router.get("", response=List[ScheduleSchema])
-def get_all_schedules(request):
-    schedules = Schedule.objects.all()
-    return list(schedules)
+@paginate(KeysetPagination)
+def get_all_schedules(request, filters: Query[ScheduleFilterSchema]):
+    return filter_schedules(filters)
+
+@async_router.get("", response=List[ScheduleSchema])
+@paginate(KeysetPagination)
+async def aget_all_schedules(request, filters: Query[ScheduleFilterSchema]):
+    """
+    Asynchronous version of get_all_schedules().
+    """
+    return filter_schedules(filters)
 
 @router.get("{schedule_id}", response=ScheduleSchema)
-def get_schedule_by_id(request, schedule_id: int):
+def get_schedule_by_id(request, response: HttpResponse, schedule_id: int):
     schedule = get_object_or_404(Schedule, pk=schedule_id)
+    not_modified = schedule_not_modified(request, response, schedule)
+    if not_modified:
+        return not_modified
+    prefetch_related_objects([schedule], SLOT_IDS)
+    return schedule
+
+@async_router.get("{schedule_id}", response=ScheduleSchema)
+async def aget_schedule_by_id(request, response: HttpResponse, schedule_id: int):
+    """
+    Asynchronous version of get_schedule_by_id().
+    """
+    schedule = await aget_object_or_404(Schedule, pk=schedule_id)
+    not_modified = schedule_not_modified(request, response, schedule)
+    if not_modified:
+        return not_modified
+    await aprefetch_related_objects([schedule], SLOT_IDS)
     return schedule
+
+
+class LineupSlotSchema(Schema):
+    class Config:
+        title= "Lineup slot"
+    id: Optional[int] = None
+    position: Optional[int] = None
+    start_time: Optional[time] = None
+    name: Optional[str] = None
+    status: Optional[Slot.Status] = None
+
+
+class LineupSchema(Schema):
+    class Config:
+        title= "Lineup"
+    id: int
+    date: date
+    start_time: datetime
+    end_time: datetime
+    slot_duration: timedelta
+    unlock_hours: int
+    version: int
+    slots: List[LineupSlotSchema]
+
+
+LINEUP_SLOT_FIELDS = tuple(LineupSlotSchema.model_fields)
+
+
+def lineup_fields(fields: Optional[str]) -> tuple[str, ...]:
+    """
+    Parses the comma separated slot fields of a lineup request.
+
+    Raises:
+        HttpError: 400 if a field is unknown.
+    """
+    if not fields:
+        return LINEUP_SLOT_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in LINEUP_SLOT_FIELDS]
+    if unknown or not selected:
+        raise HttpError(400, f"Unknown fields: {', '.join(unknown)}, choose from {', '.join(LINEUP_SLOT_FIELDS)}")
+    return selected
+
+
+def schedule_lookup(reference: str) -> dict:
+    """
+    Returns the lookup of a schedule addressed by id or date.
+
+    Raises:
+        HttpError: 404 if the reference is neither.
+    """
+    if reference.isdigit():
+        return {"pk": int(reference)}
+    try:
+        return {"date": date.fromisoformat(reference)}
+    except ValueError:
+        raise HttpError(404, "Not Found")
+
+
+def lineup_not_modified(request, response: HttpResponse, schedule: Schedule, fields: Optional[str], selected: tuple[str, ...]):
+    minute = timezone.now().replace(second=0, microsecond=0)
+    return schedule_not_modified(
+        request, response, schedule, now=minute,
+        variant=",".join(selected) if fields else None,
+    )
+
+
+def lineup_slots(schedule: Schedule):
+    return schedule.slots.only("id", "schedule", "position", "start_time", "name", "slot_id")
+
+
+def lineup(schedule: Schedule, slots, selected: tuple[str, ...]) -> dict:
+    """
+    Returns the lineup of a schedule with the selected fields of its slots.
+    """
+    now = datetime.now().replace(second=0, microsecond=0)
+    values = {
+        "id": lambda slot: slot.id,
+        "position": lambda slot: slot.position,
+        "start_time": lambda slot: slot.start_time,
+        "name": lambda slot: slot.name,
+        "status": lambda slot: slot.get_status(now),
+    }
+    return {
+        "id": schedule.id,
+        "date": schedule.date,
+        "start_time": schedule.start_time,
+        "end_time": schedule.end_time,
+        "slot_duration": schedule.slot_duration,
+        "unlock_hours": schedule.unlock_hours,
+        "version": schedule.version,
+        "slots": [
+            {field: values[field](slot) for field in selected}
+            for slot in slots
+        ],
+    }
+
+
+@router.get("{reference}/lineup", response=LineupSchema, exclude_unset=True)
+def get_lineup(request, response: HttpResponse, reference: str, fields: Optional[str] = None):
+    """
+    Returns a schedule, addressed by id or date, with all of its slots and
+    their status as seen by a visitor without a slot, in two queries.
+
+    `fields` selects the slot fields, e.g. `?fields=start_time,name`.
+    """
+    selected = lineup_fields(fields)
+    schedule = get_object_or_404(Schedule, **schedule_lookup(reference))
+    return (
+        lineup_not_modified(request, response, schedule, fields, selected)
+        or lineup(schedule, lineup_slots(schedule), selected)
+    )
+
+@async_router.get("{reference}/lineup", response=LineupSchema, exclude_unset=True)
+async def aget_lineup(request, response: HttpResponse, reference: str, fields: Optional[str] = None):
+    """
+    Asynchronous version of get_lineup().
+    """
+    selected = lineup_fields(fields)
+    schedule = await aget_object_or_404(Schedule, **schedule_lookup(reference))
+    return (
+        lineup_not_modified(request, response, schedule, fields, selected)
+        or lineup(schedule, [slot async for slot in lineup_slots(schedule)], selected)
+    )
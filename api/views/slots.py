@@ -1,13 +1,23 @@
 from typing import List, Optional
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 
 from ninja import ModelSchema, Router, Schema
+from pydantic import model_validator
 
 from drummerei.models.schedule import Schedule
-from drummerei.models.slot import Slot
+from drummerei.models.slot import Slot, SlotAlreadyReserved
+
+from ..conditional import schedule_not_modified
 
+# the sync handlers serve WSGI, the async ones ASGI, see api.urls. Writes
+# need a transaction, the async ones run the sync handlers in a thread like
+# the writes of the async ORM.
 router = Router(tags=["Resources"])
+async_router = Router(tags=["Resources"])
 
 
 class PinSchema(Schema):
@@ -20,6 +30,24 @@ class ReservationSchema(PinSchema):
         title= "Reservation"
     name: str
 
+class SlotOperationSchema(Schema):
+    class Config:
+        title= "Slot operation"
+    op: Slot.Operation
+    id: int
+    name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_name(self):
+        if self.op != Slot.Operation.CLEAR and not self.name:
+            raise ValueError(f"{self.op.value} requires a name")
+        return self
+
+class SlotBatchSchema(PinSchema):
+    class Config:
+        title= "Slot batch"
+    operations: List[SlotOperationSchema]
+
 class SlotSchema(ModelSchema):
     class Config:
         title= "Slot"
@@ -28,37 +56,103 @@ class SlotSchema(ModelSchema):
     pin: Optional[int] = None
 
 
+def batch_operations(payload: SlotBatchSchema) -> list:
+    return [
+        (operation.op, operation.id, operation.name)
+        for operation in payload.operations
+    ]
+
+def batch_error(error: Exception) -> JsonResponse:
+    status = 404 if isinstance(error, Slot.DoesNotExist) else 409
+    return JsonResponse({"error": str(error)}, status=status)
+
+INVALID_PIN = {"error": "Invalid PIN"}
+
+
 @router.get("{schedule_id}/slots",response=List[SlotSchema])
-def get_all_slots(request, schedule_id: int):
+def get_all_slots(request, response: HttpResponse, schedule_id: int):
     schedule = get_object_or_404(Schedule, pk=schedule_id)
-    return list(schedule.slots.all())
+    return schedule_not_modified(request, response, schedule) or list(schedule.slots.all())
+
+@async_router.get("{schedule_id}/slots",response=List[SlotSchema])
+async def aget_all_slots(request, response: HttpResponse, schedule_id: int):
+    """
+    Asynchronous version of get_all_slots().
+    """
+    schedule = await aget_object_or_404(Schedule, pk=schedule_id)
+    return schedule_not_modified(request, response, schedule) or [
+        slot async for slot in schedule.slots.all()
+    ]
+
+@router.patch("{schedule_id}/slots",response=List[SlotSchema])
+def update_slots(request, schedule_id: int, payload:SlotBatchSchema):
+    schedule = get_object_or_404(Schedule, pk=schedule_id)
+    if schedule.pin == payload.pin:
+        try:
+            return schedule.slots.apply(batch_operations(payload))
+        except (Slot.DoesNotExist, SlotAlreadyReserved) as e:
+            return batch_error(e)
+    else:
+        return JsonResponse(INVALID_PIN, status=401)
+
+@async_router.patch("{schedule_id}/slots",response=List[SlotSchema])
+async def aupdate_slots(request, schedule_id: int, payload:SlotBatchSchema):
+    """
+    Asynchronous version of update_slots().
+    """
+    return await sync_to_async(update_slots)(request, schedule_id, payload)
 
 @router.get("{schedule_id}/slots/{slot_id}",response=SlotSchema)
-def get_slot_by_id(request, schedule_id: int, slot_id: int):
+def get_slot_by_id(request, response: HttpResponse, schedule_id: int, slot_id: int):
     schedule = get_object_or_404(Schedule, pk=schedule_id)
-    slot = schedule.slots.get(pk=slot_id)
-    return slot
+    return (
+        schedule_not_modified(request, response, schedule)
+        or get_object_or_404(schedule.slots, pk=slot_id)
+    )
+
+@async_router.get("{schedule_id}/slots/{slot_id}",response=SlotSchema)
+async def aget_slot_by_id(request, response: HttpResponse, schedule_id: int, slot_id: int):
+    """
+    Asynchronous version of get_slot_by_id().
+    """
+    schedule = await aget_object_or_404(Schedule, pk=schedule_id)
+    return (
+        schedule_not_modified(request, response, schedule)
+        or await aget_object_or_404(schedule.slots, pk=slot_id)
+    )
 
 @router.patch("{schedule_id}/slots/{slot_id}/reserve",response=SlotSchema)
 def reserve_slot_with_id(request, schedule_id: int, slot_id: int, payload:ReservationSchema):
     schedule = get_object_or_404(Schedule, pk=schedule_id)
     if schedule.pin == payload.pin:
-        #name = request.PATCH.get("name")
-        name = payload.name
-        slot = schedule.slots.get(pk=slot_id)
-        slot.name = name
-        slot.save()
-        return slot
+        slots = schedule.slots.filter(pk=slot_id)
+        if not slots.reserve(payload.name, uuid4()):
+            get_object_or_404(slots)
+            return JsonResponse({"error": "Slot is already reserved"}, status=409)
+        return slots.get()
     else:
-        return JsonResponse({"error": "Invalid PIN"}, status=401)
+        return JsonResponse(INVALID_PIN, status=401)
+
+@async_router.patch("{schedule_id}/slots/{slot_id}/reserve",response=SlotSchema)
+async def areserve_slot_with_id(request, schedule_id: int, slot_id: int, payload:ReservationSchema):
+    """
+    Asynchronous version of reserve_slot_with_id().
+    """
+    return await sync_to_async(reserve_slot_with_id)(request, schedule_id, slot_id, payload)
 
 @router.patch("{schedule_id}/slots/{slot_id}/clear",response=SlotSchema)
 def clear_slot_with_id(request, schedule_id: int, slot_id: int, payload:PinSchema):
     schedule = get_object_or_404(Schedule, pk=schedule_id)
     if schedule.pin == payload.pin:
-        slot = schedule.slots.get(pk=slot_id)
-        slot.name = None
-        slot.save()
+        slot = get_object_or_404(schedule.slots, pk=slot_id)
+        slot.clear_slot()
         return slot
     else:
-        return JsonResponse({"error": "Invalid PIN"}, status=401)
+        return JsonResponse(INVALID_PIN, status=401)
+
+@async_router.patch("{schedule_id}/slots/{slot_id}/clear",response=SlotSchema)
+async def aclear_slot_with_id(request, schedule_id: int, slot_id: int, payload:PinSchema):
+    """
+    Asynchronous version of clear_slot_with_id().
+    """
+    return await sync_to_async(clear_slot_with_id)(request, schedule_id, slot_id, payload)
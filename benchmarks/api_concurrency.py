@@ -0,0 +1,180 @@
+"""
+Compares the concurrent request capacity of a single worker process serving
+the API with its async handlers under ASGI (uvicorn) and with its sync
+handlers under WSGI (a gunicorn sync worker).
+
+A fresh database with a benchmark schedule is migrated in a temporary
+directory, one server is started at a time and a number of concurrent
+clients request the slots of the schedule until the requested number of
+requests has been served. For each concurrency level the throughput and the
+latency percentiles are printed. The results of the last run are stored in
+benchmarks/api_concurrency.json.
+
+Requires uvicorn next to the project requirements:
+
+    pip install uvicorn
+    python benchmarks/api_concurrency.py --concurrency 1 16 64 256 \
+        --output benchmarks/api_concurrency.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SERVERS = {
+    "asgi": [sys.executable, "-m", "uvicorn", "core.asgi:application", "--workers", "1", "--log-level", "warning", "--port"],
+    "wsgi": [sys.executable, "-m", "gunicorn", "core.wsgi:application", "--workers", "1", "--log-level", "warning", "--bind"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name: str, port: int) -> subprocess.Popen:
+    address = str(port) if name == "asgi" else f"127.0.0.1:{port}"
+    # the servers inherit the settings of the temporary database
+    server = subprocess.Popen([*SERVERS[name], address], cwd=BASE_DIR, env=os.environ)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"{name} server did not start")
+
+
+async def request(port: int, path: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return time.perf_counter() - started, status
+
+
+async def load(port: int, path: str, concurrency: int, requests: int) -> tuple[float, list[float], int]:
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            try:
+                latency, status = await request(port, path)
+            except OSError:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[p - 1]
+
+
+def setup_django(directory: Path):
+    """
+    Configures Django, here and in the servers, with a database in directory.
+    """
+    (directory / "benchmark_settings.py").write_text(
+        "from core.settings import *\n"
+        f"DATABASES = {{'default': {{**DATABASES['default'], 'NAME': {str(directory / 'db.sqlite3')!r}}}}}\n"
+    )
+    sys.path[:0] = [str(directory), str(BASE_DIR)]
+    os.chdir(BASE_DIR)
+    os.environ["PYTHONPATH"] = os.pathsep.join([str(directory), str(BASE_DIR)])
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmark_settings"
+    import django
+    django.setup()
+
+
+def create_schedule(directory: Path) -> int:
+    from django.core.management import call_command
+    from drummerei import qr
+    from drummerei.models.schedule import Schedule
+    from drummerei.models.settings import Settings
+
+    call_command("migrate", verbosity=0)
+    settings = Settings.load()
+    settings.default_qr_code_path = str(directory / "qr.png")
+    settings.save()
+    schedule = Schedule.objects.create()
+    qr.wait()
+    return schedule.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(Path(directory))
+        path = f"/api/schedules/{create_schedule(Path(directory))}/slots"
+        print(f"{'server':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for name in args.servers:
+            port = free_port()
+            server = start_server(name, port)
+            try:
+                for concurrency in args.concurrency:
+                    elapsed, latencies, errors = asyncio.run(
+                        load(port, path, concurrency, args.requests)
+                    )
+                    result = {
+                        "server": name,
+                        "clients": concurrency,
+                        "requests_per_second": round(len(latencies) / elapsed, 1),
+                        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                        "errors": errors,
+                    }
+                    results.append(result)
+                    print(
+                        f"{name:<6} {concurrency:>7} {result['requests_per_second']:>9.1f}"
+                        f" {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {errors:>6}"
+                    )
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "database_profile": os.environ.get("DATABASE_PROFILE", "development"),
+            "requests": args.requests,
+            "results": results,
+        }, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measures write throughput of the SQLite database profiles under contention.
+
+For each profile a fresh database is migrated in a temporary directory and
+a number of worker processes reserve and clear random slots of one schedule
+at the same time, the way several server processes do during the unlock
+rush. For each profile the throughput, the latency percentiles and the
+number of writes that failed with "database is locked" are printed.
+
+    python benchmarks/sqlite_contention.py --processes 8 --writes 500
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(profile: str, path: Path):
+    sys.path.insert(0, str(BASE_DIR))
+    os.chdir(BASE_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    from django.conf import settings
+    settings.DATABASES = {
+        "default": {**settings.DATABASE_PROFILES[profile], "NAME": path},
+    }
+    import django
+    django.setup()
+
+
+def prepare(profile: str, path: Path, queue: multiprocessing.Queue):
+    setup_django(profile, path)
+    from django.core.management import call_command
+    from drummerei import qr
+    from drummerei.models.schedule import Schedule
+    from drummerei.models.settings import Settings
+
+    call_command("migrate", verbosity=0)
+    settings = Settings.load()
+    settings.default_qr_code_path = str(path.with_suffix(".png"))
+    settings.save()
+    schedule = Schedule.objects.create()
+    qr.wait()
+    queue.put(list(schedule.slots.values_list("id", flat=True)))
+
+
+def write(profile: str, path: Path, slot_ids: list[int], writes: int, start, queue: multiprocessing.Queue):
+    setup_django(profile, path)
+    from django.db import OperationalError
+    from drummerei.models.slot import Slot
+
+    latencies = []
+    locked = 0
+    start.wait()
+    for i in range(writes):
+        slot_id = random.choice(slot_ids)
+        slots = Slot.objects.filter(pk=slot_id)
+        started = time.perf_counter()
+        try:
+            # reserve the slot, or clear it if someone else holds it
+            if not slots.reserve(f"DJ {os.getpid()}-{i}", uuid4()):
+                slots.apply([(Slot.Operation.CLEAR, slot_id, None)])
+        except OperationalError:
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    queue.put((latencies, locked))
+
+
+def run(profile: str, processes: int, writes: int) -> tuple[float, list[float], int]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    with tempfile.TemporaryDirectory() as dir:
+        path = Path(dir) / "contention.sqlite3"
+        preparation = ctx.Process(target=prepare, args=(profile, path, queue))
+        preparation.start()
+        slot_ids = queue.get()
+        preparation.join()
+
+        start = ctx.Event()
+        workers = [
+            ctx.Process(target=write, args=(profile, path, slot_ids, writes, start, queue))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        # give the workers time to import Django before starting the clock
+        time.sleep(2)
+        started = time.perf_counter()
+        start.set()
+        results = [queue.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return elapsed, latencies, sum(locked for _, locked in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["development", "production"])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'profile':<12} {'writes/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'locked':>6}")
+    for profile in args.profiles:
+        elapsed, latencies, locked = run(profile, args.processes, args.writes)
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{profile:<12} {len(latencies) / elapsed:>9.1f}"
+            f" {quantiles[49] * 1000:>8.1f} {quantiles[98] * 1000:>8.1f} {locked:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+The URLs of requests that came in through ASGI.
+
+The same as core.urls, except that the API is served by its async handlers.
+"""
+
+from django.urls import include, path
+
+from api.urls import async_urlpatterns
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+    *wsgi_urlpatterns,
+]
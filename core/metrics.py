@@ -0,0 +1,204 @@
+"""
+In-process request metrics.
+
+The timing middleware collects the duration, database time, query count and
+template render time of every request and aggregates them per route into
+histograms, which are exposed in the Prometheus text format at /metrics.
+
+The histograms live in the memory of each worker process, so with several
+workers every scrape sees the numbers of the worker that answered it.
+/metrics is only served to the addresses and the token in the settings.
+"""
+
+import secrets
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass
+class RequestMetrics:
+    """
+    The numbers collected while handling one request.
+
+    Attributes:
+        queries (int): The number of database queries.
+        db_seconds (float): The time spent executing database queries.
+        template_seconds (float): The time spent rendering templates.
+    """
+    queries: int = 0
+    db_seconds: float = 0.0
+    template_seconds: float = 0.0
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+
+def start_request() -> tuple[RequestMetrics, object]:
+    """
+    Starts collecting metrics for the current request.
+
+    Returns:
+        tuple[RequestMetrics, object]: The metrics of the request and a token
+            to pass to finish_request().
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token: object):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Times a database query of the current request.
+
+    Installed as an execute wrapper on every database connection.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += perf_counter() - started
+        metrics.queries += 1
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Installs record_query() on a database connection.
+
+    Connected to the connection_created signal.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_template(seconds: float):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.template_seconds += seconds
+
+
+class Histogram:
+    """
+    A Prometheus histogram with labels.
+
+    Args:
+        name (str): The metric name.
+        help (str): The description of the metric.
+        buckets (tuple): The upper bounds of the buckets.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, label_names: tuple) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ",".join(
+                f'{name}="{escape(value)}"' for name, value in zip(label_names, labels)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {values[-1]}")
+        return lines
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+LABELS = ("route", "method")
+
+# other methods are counted as "other", they come from the client and would
+# add a series per made-up method
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"))
+
+REQUEST_DURATION = Histogram(
+    "drummerei_request_duration_seconds", "Time to handle a request.", DURATION_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "drummerei_request_db_seconds", "Time spent in database queries per request.", DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "drummerei_request_queries", "Database queries per request.", QUERY_BUCKETS,
+)
+REQUEST_TEMPLATE_DURATION = Histogram(
+    "drummerei_request_template_seconds", "Time spent rendering templates per request.", DURATION_BUCKETS,
+)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_QUERIES, REQUEST_TEMPLATE_DURATION)
+
+
+def observe(route: str, method: str, seconds: float, metrics: RequestMetrics):
+    labels = (route, method if method in METHODS else "other")
+    REQUEST_DURATION.observe(labels, seconds)
+    REQUEST_DB_DURATION.observe(labels, metrics.db_seconds)
+    REQUEST_QUERIES.observe(labels, metrics.queries)
+    REQUEST_TEMPLATE_DURATION.observe(labels, metrics.template_seconds)
+
+
+def is_allowed(request) -> bool:
+    """
+    Checks whether a request may read the metrics.
+
+    Returns:
+        bool: True if the request sends the METRICS_TOKEN setting as a bearer
+        token or comes directly, without a proxy, from one of the
+        METRICS_ALLOWED_IPS.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    if token and secrets.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        return True
+    return (
+        "X-Forwarded-For" not in request.headers
+        and request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request) -> HttpResponse:
+    if not is_allowed(request):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render(LABELS)
+    return HttpResponse(
+        "\n".join(lines) + "\n",
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
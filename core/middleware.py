@@ -0,0 +1,79 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+
+class TimingMiddleware:
+    """
+    Measures every request and reports it in a Server-Timing header.
+
+    The duration, database time, query count and template render time are
+    aggregated per route into the histograms of core.metrics. Requests that
+    don't resolve to a route are collected under "unmatched".
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(metrics.install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request_metrics, token = metrics.start_request()
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, perf_counter() - started, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, perf_counter() - started, request_metrics)
+
+    def finish(self, request, response, seconds, request_metrics):
+        match = request.resolver_match
+        route = match.route if match else "unmatched"
+        metrics.observe(route, request.method, seconds, request_metrics)
+
+        response["Server-Timing"] = ", ".join((
+            f"total;dur={seconds * 1000:.1f}",
+            f'db;dur={request_metrics.db_seconds * 1000:.1f};desc="{request_metrics.queries} queries"',
+            f"tpl;dur={request_metrics.template_seconds * 1000:.1f}",
+        ))
+        return response
+
+
+class AsgiUrlconfMiddleware(MiddlewareMixin):
+    """
+    Resolves requests that came in through ASGI with settings.ASGI_URLCONF.
+
+    Under ASGI the API is served by its async handlers. Under WSGI they would
+    run through async_to_sync, so WSGI requests keep the sync handlers of
+    ROOT_URLCONF. benchmarks/api_concurrency.py compares both.
+    """
+
+    def process_request(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from dotenv import dotenv_values
@@ -10,7 +11,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = dotenv_values(".env")["SECRET_KEY"]
+ENV = dotenv_values(".env")
+
+SECRET_KEY = ENV["SECRET_KEY"]
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -34,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.TimingMiddleware',  # outermost, so it times all other middleware
+    'core.middleware.AsgiUrlconfMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add cors middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,9 +57,13 @@ CORS_ALLOWED_ORIGINS = [
 
 ROOT_URLCONF = 'core.urls'
 
+# serves the async API handlers under ASGI, see core.middleware.AsgiUrlconfMiddleware
+ASGI_URLCONF = 'core.asgi_urls'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the Django backend, timing renders for core.metrics
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,10 +83,62 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# "production" tunes SQLite for concurrent reservations, select it with
+# DATABASE_PROFILE=production in the environment or in .env
+
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", ENV.get("DATABASE_PROFILE", "development"))
+
+DATABASE_PROFILES = {
+    'development': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # a file instead of a shared in-memory database: the threaded race
+        # tests in drummerei.tests.test_slot, the loadtest smoke test and the
+        # event streams, which read the log from another thread than the
+        # writes, open concurrent connections. On a file they wait for the
+        # lock, the shared cache of an in-memory database fails at once with
+        # "table is locked". Django has one test database per alias, so this
+        # applies to every test.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    'production': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # transactions take the write lock when they begin, a deferred
+            # transaction that upgrades its lock fails without waiting
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # applied to every new connection, see drummerei.sqlite
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 128 * 1024 * 1024,
+            'cache_size': -32 * 1024,
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+}
+
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'drummerei',
     }
 }
 
@@ -123,7 +184,30 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / 'static'
 
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # the hashed names templates link once collectstatic ran, for runserver
+    'core.staticfiles.CollectedFilesFinder',
+]
+
+# collectstatic writes hashed names and gzip/brotli variants, served by core.staticfiles.serve
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "core.staticfiles.CompressedManifestStaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# /metrics answers direct requests from these addresses and requests that
+# send METRICS_TOKEN as a bearer token, set it in .env to scrape through a
+# proxy. Proxied requests, recognized by X-Forwarded-For, need the token.
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_TOKEN = ENV.get("METRICS_TOKEN")
@@ -0,0 +1,195 @@
+"""
+Hashed, precompressed static files served by the application.
+
+collectstatic copies the static files to STATIC_ROOT under content hashed
+names, recorded in a manifest, and writes a gzip and, if the brotli package is
+installed, a brotli variant next to every compressible file. serve() answers
+requests for them with the best variant the client accepts. Hashed names
+change with their content, so they are cached forever.
+
+Templates link the hashed names whenever the manifest exists, also with DEBUG
+on. Without it, before collectstatic ran, they link the unhashed names, which
+the development server finds in the apps. CollectedFilesFinder lets the
+development server find the hashed names as well.
+"""
+
+import gzip
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    StaticFilesStorage,
+    staticfiles_storage,
+)
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".map", ".json", ".txt", ".html")
+
+# the 12 hex digit hash ManifestStaticFilesStorage puts before the extension
+HASHED_NAME = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{12}(?P<extension>\.[^./]+)?$")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# file suffix and compress function by content encoding, preferred first
+ENCODINGS = {
+    "br": (".br", lambda data: brotli.compress(data, quality=11)),
+    "gzip": (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+}
+
+
+def available_encodings() -> dict:
+    return {
+        encoding: variant for encoding, variant in ENCODINGS.items()
+        if encoding != "br" or brotli is not None
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Stores static files under hashed names and writes compressed variants.
+
+    Variants that don't save at least 5% are skipped. URLs are hashed
+    regardless of DEBUG, names missing from the manifest, e.g. before
+    collectstatic ran, resolve to their unhashed URL.
+    """
+
+    # url() and @import of stylesheets, the patterns of
+    # ManifestStaticFilesStorage without sourceMappingURL: the vendored
+    # Bootstrap files reference source maps that are not shipped, which would
+    # fail collectstatic
+    patterns = (
+        ("*.css", (
+            r"""(?P<matched>url\(['"]{0,1}\s*(?P<url>.*?)["']{0,1}\))""",
+            (
+                r"""(?P<matched>@import\s*["']\s*(?P<url>.*?)["'])""",
+                """@import url("%(url)s")""",
+            ),
+        )),
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # the manifest holds the final names after all passes
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(hashed_name)
+
+    def compress(self, name: str) -> list[str]:
+        """
+        Writes the compressed variants of a stored file.
+
+        Args:
+            name (str): The stored name of the file.
+
+        Returns:
+            list[str]: The names of the written variants.
+        """
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        written = []
+        for suffix, compress in available_encodings().values():
+            compressed = compress(data)
+            if len(compressed) < len(data) * 0.95:
+                Path(f"{path}{suffix}").write_bytes(compressed)
+                written.append(f"{name}{suffix}")
+        return written
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force=True)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
+
+
+class CollectedFilesFinder(BaseFinder):
+    """
+    Finds the hashed names of the collected files in STATIC_ROOT.
+
+    The development server serves static files found by the finders, which
+    only know the unhashed names of the apps. Lists no files, so collectstatic
+    doesn't collect STATIC_ROOT into itself.
+    """
+
+    def find(self, path, find_all=False, **kwargs):
+        # an empty list for no match, like the finders of Django
+        if not is_hashed(path):
+            return []
+        match = staticfiles_storage.path(path)
+        return [match] if find_all else match
+
+    def list(self, ignore_patterns):
+        return []
+
+
+def is_hashed(name: str) -> bool:
+    """
+    Returns whether a name is the hashed name of a collected file.
+    """
+    match = HASHED_NAME.match(name)
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+    if match is None or not hashed_files:
+        return False
+    original = match["stem"] + (match["extension"] or "")
+    return hashed_files.get(original) == name
+
+
+def serve(request, path: str):
+    """
+    Serves a collected static file, compressed if the client accepts it.
+
+    Hashed files are cached forever, other files are revalidated against their
+    modification time.
+    """
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Static file not found")
+    if not full_path.is_file():
+        raise Http404("Static file not found")
+
+    content_type, _ = mimetypes.guess_type(full_path.name)
+    # HTTP dates have a resolution of one second
+    last_modified = int(full_path.stat().st_mtime)
+
+    response = get_conditional_response(request, last_modified=last_modified)
+    if response is None:
+        accepted = {
+            encoding.split(";")[0].strip()
+            for encoding in request.headers.get("Accept-Encoding", "").split(",")
+        }
+        served_path, content_encoding = full_path, None
+        for encoding, (suffix, _) in available_encodings().items():
+            variant = Path(f"{full_path}{suffix}")
+            if encoding in accepted and variant.is_file():
+                served_path, content_encoding = variant, encoding
+                break
+
+        response = FileResponse(
+            served_path.open("rb"),
+            content_type=content_type or "application/octet-stream",
+        )
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+        response["Last-Modified"] = http_date(last_modified)
+
+    if is_hashed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,33 @@
+from time import perf_counter
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import metrics
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_template(perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each render for the request metrics.
+
+    Only templates loaded through the backend are timed, templates included
+    by them are part of their render time.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
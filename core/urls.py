@@ -1,15 +1,16 @@
 from django.contrib import admin
-from django.urls import path,include
+from django.urls import path,include,re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.metrics import metrics
+from core.staticfiles import serve as serve_static
 
 
 urlpatterns = [
     path('api/', include("api.urls")),
     path('admin/doc/', include('django.contrib.admindocs.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics),
+    re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', serve_static),
     path('', include('drummerei.urls')),
-] + static(
-    settings.STATIC_URL,
-    document_root=settings.STATIC_ROOT
-)
+]
@@ -5,15 +5,32 @@ from .models.schedule import Schedule
 
 class SlotAdmin(admin.ModelAdmin):
     list_display = ('name', 'start_time', 'get_schedule')
+    list_select_related = ('schedule',)
 
     def get_schedule(self, obj):
-        return obj.schedule_set.all().first()
+        return obj.schedule
     get_schedule.short_description = 'Schedule'
     
 
+class SlotInline(admin.TabularInline):
+    model = Slot
+    fields = ('start_time', 'name', 'slot_id')
+    extra = 0
+
+
 class ScheduleAdmin(admin.ModelAdmin):
     # list_display = ('name', 'start_time', 'get_schedule')
-    filter_horizontal = ('slots',)
+    inlines = (SlotInline,)
+
+    def save_model(self, request, obj, form, change):
+        # the slots are reconciled after the inline slots are saved, which
+        # would otherwise write their stale rows over the reconciled ones
+        form.changed_times = obj.changed_fields() if change else {}
+        obj.save(reconcile=False)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.reconcile_changed_slots(form.changed_times)
 
     
 admin.site.register(Slot,SlotAdmin)
@@ -0,0 +1,31 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+
+
+class DrummereiConfig(AppConfig):
+    name = "drummerei"
+
+    def ready(self):
+        from .models.settings import (
+            Settings,
+            invalidate_settings_cache,
+            pin_settings_for_request,
+            release_settings_for_request,
+        )
+
+        request_started.connect(pin_settings_for_request)
+        request_finished.connect(release_settings_for_request)
+        post_delete.connect(invalidate_settings_cache, sender=Settings)
+
+        from .sqlite import apply_pragmas
+
+        connection_created.connect(apply_pragmas)
+
+        # before any connection exists, the middleware is only built on the
+        # first request and only sees the connections of its own thread
+        from core.metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+
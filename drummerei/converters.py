@@ -0,0 +1,17 @@
+from datetime import date
+
+
+class DateConverter:
+    """
+    Matches ISO 8601 dates like 2025-01-31 in URLs.
+
+    Paths that are no valid date, like favicon.ico or 2025-13-01, don't match
+    and never reach the database.
+    """
+    regex = r"[0-9]{4}-[0-9]{2}-[0-9]{2}"
+
+    def to_python(self, value: str) -> date:
+        return date.fromisoformat(value)
+
+    def to_url(self, value: date) -> str:
+        return value.isoformat()
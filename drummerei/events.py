@@ -0,0 +1,166 @@
+import asyncio
+import json
+import weakref
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models.change import SlotChange
+
+# Seconds between two reads of the SlotChange log.
+POLL_INTERVAL = 0.5
+
+# Seconds after which an idle stream sends a comment to keep the connection open.
+KEEPALIVE_INTERVAL = 15
+
+# Changes older than this are removed from the log.
+RETENTION = timedelta(hours=1)
+
+# Number of polls between two cleanups of the log.
+PRUNE_EVERY = 600
+
+# Changes buffered per stream. A stream that falls further behind is closed,
+# the client reconnects and replays the missed changes from the log.
+QUEUE_SIZE = 100
+
+
+class ChangeTail:
+    """
+    Tails the SlotChange log and fans changes out to the subscribed streams.
+
+    Each process runs one tail per event loop, so the log is read once per
+    process regardless of the number of connected clients. The tail starts
+    with the first subscriber and stops when the last one leaves. The queue
+    of a subscriber that doesn't keep up is closed with a None marker.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[int, set[asyncio.Queue]] = {}
+        self.task: asyncio.Task | None = None
+
+    async def subscribe(self, schedule_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(schedule_id, set()).add(queue)
+        if self.task is None or self.task.done():
+            last_id = await latest_change_id()
+            if self.task is None or self.task.done():
+                self.task = asyncio.get_running_loop().create_task(self.run(last_id))
+        return queue
+
+    def unsubscribe(self, schedule_id: int, queue: asyncio.Queue):
+        queues = self.subscribers.get(schedule_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(schedule_id, None)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def close(self, schedule_id: int, queue: asyncio.Queue):
+        """
+        Drops a subscriber that fell behind and tells its stream to end.
+        """
+        queues = self.subscribers.get(schedule_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(schedule_id, None)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def run(self, last_id: int):
+        polls = 0
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            async for change in SlotChange.objects.filter(id__gt=last_id).order_by("id"):
+                last_id = change.id
+                for queue in tuple(self.subscribers.get(change.schedule_id, ())):
+                    try:
+                        queue.put_nowait(change)
+                    except asyncio.QueueFull:
+                        self.close(change.schedule_id, queue)
+
+            polls += 1
+            if polls % PRUNE_EVERY == 0:
+                await SlotChange.objects.filter(
+                    created__lt=timezone.now() - RETENTION
+                ).adelete()
+
+
+_tails: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_tail() -> ChangeTail:
+    """
+    Returns the tail of the running event loop.
+
+    Returns:
+        ChangeTail: The tail of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _tails:
+        _tails[loop] = ChangeTail()
+    return _tails[loop]
+
+
+async def latest_change_id() -> int:
+    """
+    Returns the ID of the latest change in the log.
+
+    Returns:
+        int: The ID of the latest change, 0 if the log is empty.
+    """
+    change = await SlotChange.objects.order_by("-id").only("id").afirst()
+    return change.id if change else 0
+
+
+def format_event(change: SlotChange) -> str:
+    """
+    Formats a change as a Server-Sent Event.
+
+    Args:
+        change (SlotChange): The change to format.
+
+    Returns:
+        str: The event, including the trailing blank line.
+    """
+    data = json.dumps({"slot": change.slot_id})
+    return f"id: {change.id}\nevent: slot\ndata: {data}\n\n"
+
+
+async def stream(schedule_id: int, last_event_id: int | None = None):
+    """
+    Streams the changes of a schedule as Server-Sent Events.
+
+    Args:
+        schedule_id (int): The ID of the schedule.
+        last_event_id (int, optional): The ID of the last event the client has
+            received. Changes after it are replayed before live changes.
+
+    Yields:
+        str: The formatted events.
+    """
+    tail = get_tail()
+    queue = await tail.subscribe(schedule_id)
+    try:
+        yield "retry: 2000\n\n"
+        if last_event_id is not None:
+            async for change in SlotChange.objects.filter(
+                schedule_id=schedule_id, id__gt=last_event_id
+            ).order_by("id"):
+                last_event_id = change.id
+                yield format_event(change)
+
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if change is None:
+                # fell behind, the client replays the rest after reconnecting
+                return
+            if last_event_id is None or change.id > last_event_id:
+                yield format_event(change)
+    finally:
+        tail.unsubscribe(schedule_id, queue)
@@ -0,0 +1,167 @@
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from drummerei.models.schedule import Schedule, as_aware
+from drummerei.models.settings import Settings
+from drummerei.models.slot import Slot
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {value!r}, expected YYYY-MM-DD")
+
+
+def parse_time(value: str):
+    try:
+        return datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value!r}, expected HH:MM")
+
+
+def parse_weekday(value: str) -> int:
+    matches = [i for i, name in enumerate(WEEKDAYS) if name.startswith(value.lower())]
+    if len(value) < 2 or len(matches) != 1:
+        raise argparse.ArgumentTypeError(f"invalid weekday: {value!r}")
+    return matches[0]
+
+
+def parse_override(value: str) -> tuple[date, tuple]:
+    """
+    Parses a per-date override like 2027-12-24=21:00-03:00.
+
+    The end time is optional. An end time before the start time ends on the
+    following day.
+    """
+    day, _, times = value.partition("=")
+    start, _, end = times.partition("-")
+    if not start:
+        raise argparse.ArgumentTypeError(f"invalid override: {value!r}, expected DATE=HH:MM[-HH:MM]")
+    return parse_date(day), (parse_time(start), parse_time(end) if end else None)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a season of recurring schedules, e.g. every Friday for a year. "
+        "Schedules and slots are inserted in bulk in one transaction. Dates that "
+        "already have a schedule are left alone. The QR codes are served by "
+        "/<date>/qr.png and /<date>/qr.svg."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", type=parse_date, required=True)
+        parser.add_argument(
+            "--until", type=parse_date,
+            help="The last possible date. Defaults to the day before 52 weeks after --from.",
+        )
+        parser.add_argument(
+            "--weekday", type=parse_weekday,
+            help="The weekday of the nights. Defaults to the weekday of --from.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=1,
+            help="The number of weeks between two nights.",
+        )
+        parser.add_argument("--start-time", type=parse_time, help="Defaults to the settings.")
+        parser.add_argument(
+            "--duration", type=int,
+            help="The length of a night in minutes. Defaults to the settings.",
+        )
+        parser.add_argument(
+            "--slot-duration", type=int,
+            help="The length of a slot in minutes. Defaults to the settings.",
+        )
+        parser.add_argument(
+            "--skip", type=parse_date, action="append", default=[],
+            help="A date without a night. Can be repeated.",
+        )
+        parser.add_argument(
+            "--override", type=parse_override, action="append", default=[],
+            help="Other times for one date, like 2027-12-24=21:00-03:00. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        settings = Settings.cached()
+        first = options["first"]
+        until = options["until"] or first + timedelta(weeks=52, days=-1)
+        if until < first:
+            raise CommandError("--until is before --from")
+        if options["interval"] < 1:
+            raise CommandError("--interval must be at least 1")
+
+        start_time = options["start_time"] or settings.default_start_time
+        duration = (
+            timedelta(minutes=options["duration"])
+            if options["duration"] else settings.default_duration
+        )
+        slot_duration = (
+            timedelta(minutes=options["slot_duration"])
+            if options["slot_duration"] else settings.default_slot_duration
+        )
+        if duration <= timedelta(0) or slot_duration <= timedelta(0):
+            raise CommandError("--duration and --slot-duration must be positive")
+
+        weekday = first.weekday() if options["weekday"] is None else options["weekday"]
+        overrides = dict(options["override"])
+        dates = self.dates(first, until, weekday, options["interval"], set(options["skip"]))
+        # overrides can add nights on other weekdays
+        dates = sorted(set(dates) | {day for day in overrides if first <= day <= until})
+
+        started = time.perf_counter()
+        existing = set(
+            Schedule.objects.filter(date__in=dates).values_list("date", flat=True)
+        )
+        schedules = []
+        for day in dates:
+            if day in existing:
+                continue
+            night_start, night_end = overrides.get(day, (start_time, None))
+            schedule_start = as_aware(datetime.combine(day, night_start))
+            if night_end is None:
+                schedule_end = schedule_start + duration
+            else:
+                schedule_end = as_aware(datetime.combine(day, night_end))
+                if schedule_end <= schedule_start:
+                    schedule_end += timedelta(days=1)
+            # explicit values, the defaults would check the settings per schedule
+            schedule = Schedule(
+                start_time=schedule_start,
+                end_time=schedule_end,
+                slot_duration=slot_duration,
+                unlock_hours=settings.default_unlock_hours,
+            )
+            # bulk_create() bypasses save(), which sets the date
+            schedule.date = schedule.event_date()
+            schedules.append(schedule)
+
+        with transaction.atomic():
+            Schedule.objects.bulk_create(schedules)
+            slots = Slot.objects.bulk_create(
+                [slot for schedule in schedules for slot in schedule.initial_slots()]
+            )
+        inserted = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Created {len(schedules)} schedules with {len(slots)} slots "
+            f"in {inserted:.2f}s, skipped {len(existing)} existing dates."
+        )
+
+    def dates(self, first: date, until: date, weekday: int, interval: int, skip: set) -> list[date]:
+        """
+        Returns every interval-th weekday from first to until, without the
+        skipped dates.
+        """
+        day = first + timedelta(days=(weekday - first.weekday()) % 7)
+        dates = []
+        while day <= until:
+            if day not in skip:
+                dates.append(day)
+            day += timedelta(weeks=interval)
+        return dates
@@ -0,0 +1,217 @@
+import json
+import logging
+import random
+import re
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings as django_settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from drummerei import qr
+from drummerei.models.schedule import Schedule
+from drummerei.models.settings import Settings
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "errors", "queries_per_request")
+
+# the slots a visitor is offered on the schedule page, locked slots have a
+# reserve form with a LOCKED button
+FREE_SLOT = re.compile(r'action="/[^"]+/slots/(\d+)/reserve"(?:(?!</form>).)*?>\s*RESERVE\s*<', re.DOTALL)
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    seconds: float
+    status: int
+    queries: int
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates a crowd of visitors opening a schedule and reserving free "
+        "slots the moment the slots unlock, and reports latency, errors, "
+        "conflicts and queries per request. Runs in-process against a "
+        "temporary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--visitors", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--slots", type=int,
+            help="Number of one minute slots of the schedule. Defaults to one per visitor.",
+        )
+        parser.add_argument(
+            "--attempts", type=int, default=3,
+            help="Reservation attempts per visitor before giving up.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+        parser.add_argument("--baseline", type=Path, help="Compare against stored results.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed relative increase of latencies and queries against the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        # conflicts and errors are counted, not logged
+        logger = logging.getLogger("django.request")
+        level = logger.level
+        logger.setLevel(logging.CRITICAL)
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as dir:
+                results = self.run_load(Path(dir), options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            logger.setLevel(level)
+
+        self.report(results)
+        if options["output"]:
+            options["output"].write_text(json.dumps(results, indent=2) + "\n")
+        if options["baseline"]:
+            self.compare(results, json.loads(options["baseline"].read_text()), options["tolerance"])
+
+    def run_load(self, dir: Path, options: dict) -> dict:
+        """
+        Replays the unlock rush against a fresh schedule.
+
+        Every visitor scans the QR code, opens the schedule with its PIN and
+        tries to reserve a random slot that the page offers as free. On a
+        conflict it reloads the page and tries again.
+        """
+        settings = Settings.load()
+        settings.default_qr_code_path = str(dir / "qr.png")
+        settings.save()
+
+        # all slots are inside the unlock window
+        slots = options["slots"] or options["visitors"]
+        start_time = datetime.now() + timedelta(minutes=5)
+        schedule = Schedule.objects.create(
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=slots),
+            slot_duration=timedelta(minutes=1),
+            unlock_hours=slots // 60 + 2,
+        )
+        qr.wait()
+        page = f"/{schedule.date}/?pin={schedule.pin}"
+
+        def visit(visitor: int) -> list[Sample]:
+            client = Client(raise_request_exception=False)
+            sample, content = self.measure(client, "page", "get", page)
+            samples = [sample]
+            for attempt in range(options["attempts"]):
+                free_slot_ids = FREE_SLOT.findall(content)
+                if not free_slot_ids:
+                    break
+                sample, _ = self.measure(
+                    client, "reserve", "post",
+                    f"/{schedule.date}/slots/{random.choice(free_slot_ids)}/reserve",
+                    {"name": f"DJ {visitor}", "pin": schedule.pin},
+                )
+                samples.append(sample)
+                if sample.status != 409:
+                    break
+                sample, content = self.measure(client, "page", "get", page)
+                samples.append(sample)
+            connection.close()
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            samples = [
+                sample
+                for visitor_samples in executor.map(visit, range(options["visitors"]))
+                for sample in visitor_samples
+            ]
+        elapsed = time.perf_counter() - started
+
+        return {
+            "database_profile": getattr(django_settings, "DATABASE_PROFILE", None),
+            "visitors": options["visitors"],
+            "concurrency": options["concurrency"],
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+            "endpoints": {
+                "page": self.summarize([s for s in samples if s.endpoint == "page"]),
+                "reserve": self.summarize([s for s in samples if s.endpoint == "reserve"]),
+                "all": self.summarize(samples),
+            },
+        }
+
+    def measure(self, client: Client, endpoint: str, method: str, path: str, data=None) -> tuple[Sample, str]:
+        """
+        Returns the sample and the content of a request.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data)
+            seconds = time.perf_counter() - started
+        return Sample(endpoint, seconds, response.status_code, len(queries)), response.content.decode()
+
+    def summarize(self, samples: list[Sample]) -> dict:
+        seconds = sorted(sample.seconds for sample in samples) or [0.0]
+        quantiles = statistics.quantiles(seconds, n=100) if len(seconds) > 1 else seconds * 99
+        return {
+            "requests": len(samples),
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p95_ms": round(quantiles[94] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2),
+            "errors": sum(sample.status not in (200, 302, 409) for sample in samples),
+            "conflicts": sum(sample.status == 409 for sample in samples),
+            "queries_per_request": round(
+                sum(sample.queries for sample in samples) / max(len(samples), 1), 2
+            ),
+        }
+
+    def report(self, results: dict):
+        self.stdout.write(
+            f"{results['database_profile']} profile, "
+            f"{results['visitors']} visitors, {results['concurrency']} concurrent: "
+            f"{results['requests_per_second']} requests/s in {results['seconds']}s"
+        )
+        self.stdout.write(
+            f"{'endpoint':<8} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+            f" {'errors':>6} {'conflicts':>9} {'queries':>7}"
+        )
+        for endpoint, summary in results["endpoints"].items():
+            self.stdout.write(
+                f"{endpoint:<8} {summary['requests']:>8} {summary['p50_ms']:>8} "
+                f"{summary['p95_ms']:>8} {summary['p99_ms']:>8} {summary['errors']:>6} "
+                f"{summary['conflicts']:>9} {summary['queries_per_request']:>7}"
+            )
+
+    def compare(self, results: dict, baseline: dict, tolerance: float):
+        """
+        Compares the results against a baseline.
+
+        Latencies and queries per request may grow by the given tolerance,
+        which absorbs the jitter of the conflict rate, errors may not grow.
+
+        Raises:
+            CommandError: If a metric regressed.
+        """
+        regressions = []
+        for endpoint, summary in results["endpoints"].items():
+            for metric in METRICS:
+                before = baseline["endpoints"][endpoint][metric]
+                after = summary[metric]
+                allowed = before if metric == "errors" else before * (1 + tolerance)
+                if after > allowed:
+                    regressions.append(f"{endpoint} {metric}: {before} -> {after}")
+
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
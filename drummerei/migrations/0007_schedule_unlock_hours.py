@@ -1,6 +1,5 @@
 # Generated by Django 5.1.5 on 2025-01-28 22:38
 
-import drummerei.models.schedule
 from django.db import migrations, models
 
 
@@ -14,6 +13,7 @@ class Migration(migrations.Migration):
         migrations.AddField(
             model_name='schedule',
             name='unlock_hours',
-            field=models.IntegerField(default=drummerei.models.schedule.generate_unlock_hours),
+            field=models.IntegerField(default=1),
+            preserve_default=False,
         ),
     ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+import drummerei.models.schedule
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0007_schedule_unlock_hours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settings',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented on every save to invalidate cached settings.'),
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='unlock_hours',
+            field=models.IntegerField(default=drummerei.models.schedule.generate_unlock_hours),
+        ),
+    ]
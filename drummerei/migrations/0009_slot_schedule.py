@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_schedules_to_slots(apps, schema_editor):
+    Schedule = apps.get_model('drummerei', 'Schedule')
+    Slot = apps.get_model('drummerei', 'Slot')
+    Through = Schedule._meta.get_field('slots').remote_field.through
+
+    slots = [
+        Slot(id=slot_id, schedule_id=schedule_id)
+        for schedule_id, slot_id in Through.objects.values_list('schedule_id', 'slot_id')
+    ]
+    Slot.objects.bulk_update(slots, ['schedule'], batch_size=500)
+
+
+def copy_slots_to_schedules(apps, schema_editor):
+    Schedule = apps.get_model('drummerei', 'Schedule')
+    Slot = apps.get_model('drummerei', 'Slot')
+    Through = Schedule._meta.get_field('slots').remote_field.through
+
+    Through.objects.bulk_create([
+        Through(schedule_id=schedule_id, slot_id=slot_id)
+        for slot_id, schedule_id in Slot.objects.filter(
+            schedule__isnull=False
+        ).values_list('id', 'schedule_id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0008_settings_version'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='slot',
+            options={'ordering': ['id']},
+        ),
+        # the reverse accessor is renamed to "slots" once the many-to-many
+        # field of the same name has been removed
+        migrations.AddField(
+            model_name='slot',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drummerei.schedule'),
+        ),
+        migrations.RunPython(copy_schedules_to_slots, copy_slots_to_schedules),
+        migrations.RemoveField(
+            model_name='schedule',
+            name='slots',
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='drummerei.schedule'),
+        ),
+    ]
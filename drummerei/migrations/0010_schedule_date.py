@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_date(apps, schema_editor):
+    Schedule = apps.get_model('drummerei', 'Schedule')
+
+    schedules = list(Schedule.objects.only('id', 'start_time'))
+    for schedule in schedules:
+        schedule.date = timezone.localdate(schedule.start_time)
+    Schedule.objects.bulk_update(schedules, ['date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0009_slot_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='date',
+            field=models.DateField(db_index=True, default=datetime.date(1970, 1, 1), editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_date, migrations.RunPython.noop),
+    ]
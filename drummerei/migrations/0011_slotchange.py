@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0010_schedule_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drummerei.schedule')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='drummerei.slot')),
+            ],
+        ),
+    ]
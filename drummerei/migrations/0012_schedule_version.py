@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0011_slotchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0012_schedule_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0013_schedule_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['start_time', 'id'], name='schedule_start_time_id_idx'),
+        ),
+    ]
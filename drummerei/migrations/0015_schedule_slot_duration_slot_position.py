@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+import datetime
+
+import drummerei.models.schedule
+from django.db import migrations, models
+
+
+def slot_spacing(slots) -> datetime.timedelta | None:
+    """
+    Returns the time between the first two slots of a schedule.
+    """
+    if len(slots) < 2:
+        return None
+    day = datetime.date.min
+    spacing = (
+        datetime.datetime.combine(day, slots[1].start_time)
+        - datetime.datetime.combine(day, slots[0].start_time)
+    )
+    # the second slot starts after midnight
+    if spacing < datetime.timedelta(0):
+        spacing += datetime.timedelta(days=1)
+    return spacing or None
+
+
+def populate_slot_durations_and_positions(apps, schema_editor):
+    """
+    Derives the slot duration of every schedule from the spacing of its slots
+    and numbers the slots.
+
+    Schedules were created with 30 minute slots, the default slot duration of
+    the settings did not exist, so schedules without two slots keep 30 minutes.
+    """
+    Schedule = apps.get_model("drummerei", "Schedule")
+    Slot = apps.get_model("drummerei", "Slot")
+
+    # slots were created in order of their start time
+    slots_by_schedule = {}
+    for slot in Slot.objects.filter(schedule__isnull=False).order_by("schedule_id", "id"):
+        slots_by_schedule.setdefault(slot.schedule_id, []).append(slot)
+
+    schedules = []
+    for schedule in Schedule.objects.filter(pk__in=slots_by_schedule):
+        spacing = slot_spacing(slots_by_schedule[schedule.pk])
+        if spacing is not None and spacing != schedule.slot_duration:
+            schedule.slot_duration = spacing
+            schedules.append(schedule)
+    Schedule.objects.bulk_update(schedules, ["slot_duration"], batch_size=500)
+
+    slots = []
+    for schedule_slots in slots_by_schedule.values():
+        for position, slot in enumerate(schedule_slots):
+            slot.position = position
+            slots.append(slot)
+    Slot.objects.bulk_update(slots, ["position"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0014_schedule_start_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='slot',
+            options={'ordering': ['position', 'id']},
+        ),
+        # a literal default, the callable reads the current Settings model
+        migrations.AddField(
+            model_name='schedule',
+            name='slot_duration',
+            field=models.DurationField(default=datetime.timedelta(minutes=30)),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='slot_duration',
+            field=models.DurationField(default=drummerei.models.schedule.generate_slot_duration),
+        ),
+        migrations.AddField(
+            model_name='slot',
+            name='position',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_slot_durations_and_positions, migrations.RunPython.noop),
+    ]
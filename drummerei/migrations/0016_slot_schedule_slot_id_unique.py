@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+import uuid
+
+from django.db import migrations, models
+
+
+def split_shared_slot_ids(apps, schema_editor):
+    """
+    Gives every but the first slot of a visitor in a schedule a new slot ID.
+
+    The reservations are kept, the visitor only loses the right to edit the
+    additional slots.
+    """
+    Slot = apps.get_model("drummerei", "Slot")
+    duplicates = (
+        Slot.objects.filter(slot_id__isnull=False)
+        .values("schedule_id", "slot_id")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        slots = Slot.objects.filter(
+            schedule_id=duplicate["schedule_id"], slot_id=duplicate["slot_id"],
+        ).order_by("position", "id")
+        for slot in slots[1:]:
+            slot.slot_id = uuid.uuid4()
+            slot.save(update_fields=["slot_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0015_schedule_slot_duration_slot_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_shared_slot_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='slot',
+            constraint=models.UniqueConstraint(fields=('schedule', 'slot_id'), name='slot_schedule_slot_id_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drummerei', '0016_slot_schedule_slot_id_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slotchange',
+            name='slot',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='drummerei.slot'),
+        ),
+    ]
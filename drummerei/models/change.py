@@ -0,0 +1,77 @@
+from django.db import models
+
+
+class SlotChange(models.Model):
+    """
+    Represents a change of a slot.
+
+    Every write to a slot appends a row to this log and increments the version
+    of its schedule. Each worker process tails
+    the log to push live updates to the pages of the changed schedule, so
+    updates reach every process without an external message broker.
+
+    Attributes:
+        schedule (Schedule): The schedule of the changed slot.
+        slot (Slot): The changed slot, which may have been deleted.
+        created (datetime): The time of the change.
+    """
+
+    schedule = models.ForeignKey(
+        "Schedule",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    # no constraint, the deletion of a slot is a change as well
+    slot = models.ForeignKey(
+        "Slot",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @classmethod
+    def record(cls, changes: list[tuple[int, int]]):
+        """
+        Appends the given changes to the log and touches their schedules.
+
+        Args:
+            changes (list[tuple[int, int]]): Pairs of slot ID and schedule ID.
+
+        Returns:
+            None
+        """
+        if not changes:
+            return
+        cls.objects.bulk_create([
+            cls(slot_id=slot_id, schedule_id=schedule_id)
+            for slot_id, schedule_id in changes
+        ])
+        Schedule = cls._meta.get_field("schedule").related_model
+        Schedule.touch({schedule_id for _, schedule_id in changes})
+
+    @classmethod
+    def record_slots(cls, slots: models.QuerySet):
+        """
+        Appends a change for each of the given slots to the log.
+
+        Slots that are not assigned to any schedule are skipped.
+
+        Args:
+            slots (QuerySet): The changed slots.
+
+        Returns:
+            None
+        """
+        cls.record(list(
+            slots.filter(schedule__isnull=False).values_list("id", "schedule_id")
+        ))
+
+    def __str__(self) -> str:
+        """
+        Returns the string representation of the change.
+
+        Returns:
+            str: The IDs of the schedule and the slot.
+        """
+        return f"Schedule {self.schedule_id}, slot {self.slot_id} @ {self.created}"
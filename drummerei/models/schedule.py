@@ -1,20 +1,24 @@
+from functools import partial
 from random import randint
 from datetime import timedelta, datetime,time
-import qrcode
+from uuid import UUID
 
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from .. import qr
+from .change import SlotChange
 from .settings import Settings
 from .slot import Slot
 
 
 def generate_start_time() -> datetime:
     today = datetime.today()
-    start = datetime.combine(today, Settings.load().default_start_time)
+    start = datetime.combine(today, Settings.cached().default_start_time)
     return start
 
 def generate_end_time() -> datetime:
-    return generate_start_time() + Settings.load().default_duration
+    return generate_start_time() + Settings.cached().default_duration
 
 
 def generate_pin() -> int:
@@ -31,7 +35,10 @@ def generate_pin() -> int:
     return pin
 
 def generate_unlock_hours() -> int:
-    return Settings.load().default_unlock_hours
+    return Settings.cached().default_unlock_hours
+
+def generate_slot_duration() -> timedelta:
+    return Settings.cached().default_slot_duration
 
 class Schedule(models.Model):
     """
@@ -39,60 +46,323 @@ class Schedule(models.Model):
 
     This model defines a schedule with slots, a unique pin, a start time, and an end time.
     It also provides methods to generate a QR code, manage slots, and handle URL generation
-    with a pin for the schedule.
+    with a pin for the schedule. The slots of a schedule are available as `slots`, the
+    reverse relation of Slot.schedule.
 
     Attributes:
-        slots (ManyToManyField): A many-to-many relationship with the Slot model.
         pin (IntegerField): A randomly generated 4-digit pin for the schedule.
         start_time (DateTimeField): The start time of the schedule.
         end_time (DateTimeField): The end time of the schedule.
+        unlock_hours (IntegerField): The number of hours slots unlock in advance.
+        slot_duration (DurationField): The duration of a single slot.
+        date (DateField): The date of the start time, stored for indexed lookups
+            by date. It is set on save().
+        version (PositiveIntegerField): Incremented on every write to the schedule
+            or one of its slots, used to invalidate cached pages.
+        modified (DateTimeField): The time of the last write to the schedule or
+            one of its slots.
     """
-    slots = models.ManyToManyField(Slot, editable=False)
     pin = models.IntegerField(default=generate_pin)
     start_time = models.DateTimeField(default=generate_start_time)
     end_time = models.DateTimeField(default=generate_end_time)
     unlock_hours = models.IntegerField(default=generate_unlock_hours)
+    slot_duration = models.DurationField(default=generate_slot_duration)
+    date = models.DateField(editable=False, db_index=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    # fields compared against their loaded values on save()
+    TRACKED_FIELDS = ("pin", "start_time", "end_time", "slot_duration")
+    # fields whose changes reconcile the slots
+    TIME_FIELDS = frozenset(("start_time", "end_time", "slot_duration"))
+
+    class Meta:
+        indexes = [
+            # keyset pagination of schedule listings
+            models.Index(fields=["start_time", "id"], name="schedule_start_time_id_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Creates an instance from a database row and remembers the loaded
+        values of the tracked fields.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        """
+        Reloads fields from the database and remembers the reloaded values of
+        the tracked fields.
+        """
+        super().refresh_from_db(using, fields, **kwargs)
+        if hasattr(self, "_loaded_values"):
+            self._loaded_values.update({
+                name: as_aware(getattr(self, name))
+                for name in self.TRACKED_FIELDS
+                if fields is None or name in fields
+            })
+
+    def changed_fields(self) -> dict:
+        """
+        Returns the tracked fields that changed since the schedule was loaded.
+
+        Tracked fields that were deferred or assigned to an instance that was
+        not loaded from the database are fetched with one query.
 
-    def save(self, *args, **kwargs):
+        Returns:
+            dict: The loaded values of the changed fields by field name.
+        """
+        loaded = dict(getattr(self, "_loaded_values", {}))
+        missing = [name for name in self.TRACKED_FIELDS if name not in loaded]
+        if missing:
+            loaded.update(
+                self.__class__.objects.filter(pk=self.pk).values(*missing).first() or {}
+            )
+        return {
+            name: loaded.get(name)
+            for name in self.TRACKED_FIELDS
+            if loaded.get(name) != as_aware(getattr(self, name))
+        }
+
+    def save(self, *args, reconcile: bool = True, **kwargs):
         """
         Saves the schedule instance.
 
         Overrides the default save method to generate a QR code and associate slots
         with the schedule. If the schedule is new, it generates slots and a QR code.
-        If the pin changes, it regenerates the QR code.
+        If the pin changes, it regenerates the QR code. If the start time, end time
+        or slot duration change, the slots are reconciled, see reconcile_slots().
+
+        New schedules are saved together with their slots in one transaction,
+        using a fixed number of queries regardless of the number of slots.
+        The QR code is rendered in the background once the transaction commits.
+        Changes are detected against the values loaded from the database, so
+        saving an existing schedule doesn't fetch it again. The version is
+        incremented in the database and deferred afterwards, it is fetched
+        when it is accessed next.
+
+        Args:
+            reconcile (bool, optional): Whether to reconcile the slots. Callers
+                that write the slots themselves pass False and reconcile
+                afterwards, see reconcile_changed_slots().
 
         Returns:
             None
         """
-        qrcode_path = Settings.load().default_qr_code_path
+        self.date = self.event_date()
+        settings = Settings.cached()
+        qrcode_path = settings.default_qr_code_path
         if self.id is None:
-            self.generate_qrcode(qrcode_path)
-            super().save(*args, **kwargs)
-            self.slots.add(*self.__generate_slots())
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                Slot.objects.bulk_create(self.initial_slots())
+                self.enqueue_qrcode(qrcode_path)
         else:
-            schedules = list(self.__class__.objects.filter(id=self.id))
-            old_schedule = schedules[0]
-            if self.pin != old_schedule.pin:
-                self.generate_qrcode(qrcode_path)
+            changed = self.changed_fields()
+            with transaction.atomic():
+                if "pin" in changed:
+                    self.enqueue_qrcode(qrcode_path)
+                # incremented in the database, slot writes may have raised it meanwhile
+                self.version = models.F("version") + 1
+                super().save(*args, **kwargs)
+                # deferred, the new version is only read if it is used
+                del self.version
+
+                if reconcile:
+                    self.reconcile_changed_slots(changed)
+
+        self._loaded_values = {
+            name: as_aware(getattr(self, name)) for name in self.TRACKED_FIELDS
+        }
+
+    def reconcile_changed_slots(self, changed: dict):
+        """
+        Reconciles the slots if a time field changed.
+
+        Args:
+            changed (dict): The loaded values of the changed fields, see
+                changed_fields().
 
-            if self.end_time != old_schedule.end_time:
-                #TODO: update slots
-                pass
-            super().save(*args, **kwargs)
+        Returns:
+            None
+        """
+        if changed.keys() & self.TIME_FIELDS:
+            self.reconcile_slots(
+                changed.get("start_time", as_aware(self.start_time)),
+                changed.get("slot_duration", self.slot_duration),
+            )
 
-    def delete(self):
+    def reconcile_slots(self, old_start_time: datetime, old_slot_duration: timedelta):
         """
-        Deletes the schedule instance.
+        Adapts the slots to changed start time, end time or slot duration.
+
+        If the slot duration stays the same and the start time moves by whole
+        slots, the slots keep their times and with them their reservations,
+        only their positions move. Otherwise the slots keep their positions and
+        get new times. Missing slots are inserted and empty slots beyond the
+        end are deleted, reserved slots are never deleted. The number of queries
+        doesn't depend on the number of slots. Every inserted, deleted, moved or
+        retimed slot is recorded in the SlotChange log, which touches the
+        schedule in the same transaction.
 
-        Overrides the default delete method to remove all associated slots
-        before deleting the schedule itself.
+        Args:
+            old_start_time (datetime): The start time before the change.
+            old_slot_duration (timedelta): The slot duration before the change.
 
         Returns:
             None
         """
-        for slot in list(self.slots.all()):
-            slot.delete()
-        super().delete()
+        start_time = as_aware(self.start_time)
+        shift, remainder = divmod(old_start_time - start_time, self.slot_duration)
+        keep_times = old_slot_duration == self.slot_duration and not remainder
+        number_of_slots = self.number_of_slots()
+
+        with transaction.atomic():
+            if keep_times and shift:
+                self.slots.update(position=models.F("position") + shift)
+
+            # position -> (id, slot ID)
+            slots = {
+                position: (id, slot_id)
+                for position, id, slot_id in self.slots.values_list("position", "id", "slot_id")
+            }
+            # every slot moved
+            changed = [id for id, _ in slots.values()] if keep_times and shift else []
+
+            vanished = [
+                position for position, (_, slot_id) in slots.items()
+                if slot_id is None and not 0 <= position < number_of_slots
+            ]
+            if vanished:
+                self.slots.filter(position__in=vanished).delete()
+                changed += [slots[position][0] for position in vanished]
+
+            if not keep_times:
+                kept = [position for position in slots if 0 <= position < number_of_slots]
+                if kept:
+                    self.slots.filter(position__in=kept).update(start_time=models.Case(*(
+                        models.When(position=position, then=models.Value(self.slot_start_time(position)))
+                        for position in kept
+                    )))
+                    changed += [slots[position][0] for position in kept]
+
+            created = Slot.objects.bulk_create(self.__generate_slots(
+                position for position in range(number_of_slots) if position not in slots
+            ))
+            changed += [slot.id for slot in created]
+
+            SlotChange.record([(id, self.id) for id in dict.fromkeys(changed)])
+
+    def initial_slots(self) -> list[Slot]:
+        """
+        Generates the slots of a new schedule, from its start to its end time.
+
+        Returns:
+            list[Slot]: A list of unsaved Slot instances.
+        """
+        return self.__generate_slots(range(self.number_of_slots()))
+
+    def number_of_slots(self) -> int:
+        return int(
+            (self.end_time - self.start_time).total_seconds() / self.slot_duration.total_seconds()
+        )
+
+    def slot_start_time(self, position: int) -> time:
+        start_time = self.start_time + position * self.slot_duration
+        if timezone.is_aware(start_time):
+            start_time = timezone.localtime(start_time)
+        return start_time.time()
+
+    @classmethod
+    def touch(cls, schedule_ids):
+        """
+        Increments the version and updates the modification time of the given
+        schedules.
+
+        Called for every write to a slot, so cached renderings of the schedules
+        are invalidated.
+
+        Args:
+            schedule_ids (Iterable[int]): The IDs of the changed schedules.
+
+        Returns:
+            None
+        """
+        cls.objects.filter(pk__in=schedule_ids).update(
+            version=models.F("version") + 1,
+            modified=timezone.now(),
+        )
+
+    def event_date(self):
+        """
+        Returns the date of the schedule's start time.
+
+        Uses the current time zone like the `start_time__date` lookup does, so
+        it matches the stored `date` field.
+
+        Returns:
+            date: The date of the start time.
+        """
+        if timezone.is_aware(self.start_time):
+            return timezone.localdate(self.start_time)
+        return self.start_time.date()
+
+    def slot_held_by(self, visitor_id: UUID | None) -> Slot | None:
+        """
+        Returns the slot of the schedule reserved by the given visitor.
+
+        A visitor holds at most one slot per schedule, so this is a single
+        lookup on the unique index of schedule and slot ID.
+
+        Args:
+            visitor_id (UUID, optional): The slot ID stored in the visitor's cookie.
+
+        Returns:
+            Slot | None: The visitor's slot, or None if the visitor holds none.
+        """
+        if visitor_id is None:
+            return None
+        try:
+            return self.slots.get(slot_id=visitor_id)
+        except Slot.DoesNotExist:
+            return None
+
+    def slot_rows(
+        self,
+        held_slot: Slot | None = None,
+        now: datetime | None = None,
+    ) -> list[tuple[Slot, Slot.Status]]:
+        """
+        Computes the status of every slot of the schedule.
+
+        All slots are fetched with a single query and checked against the same
+        point in time, so the rows of one page never disagree on the lock state.
+        Visitors holding a slot can't reserve another one.
+
+        Args:
+            held_slot (Slot, optional): The slot held by the visitor, see
+                slot_held_by().
+            now (datetime, optional): The point in time to check against.
+                Defaults to the current time.
+
+        Returns:
+            list[tuple[Slot, Slot.Status]]: The slots of the schedule paired with
+            their status.
+        """
+        if now is None:
+            now = datetime.now()
+        slot_id = held_slot.slot_id if held_slot is not None else None
+        return [
+            (slot, slot.get_status(now, slot_id, held_slot is not None))
+            for slot in self.slots.all()
+        ]
 
     def generate_url_with_pin(self) -> str:
         """
@@ -104,7 +374,7 @@ class Schedule(models.Model):
         Returns:
             str: The generated URL with the pin.
         """
-        return f"{Settings.load().url}/{self}?pin={self.pin}"
+        return f"{Settings.cached().url}/{self}?pin={self.pin}"
 
     def generate_qrcode(self, path: str):
         """
@@ -119,9 +389,24 @@ class Schedule(models.Model):
         Returns:
             None
         """
-        data = self.generate_url_with_pin()
-        img = qrcode.make(data)
-        img.save(path)
+        qr.write_qrcode(self.generate_url_with_pin(), path)
+
+    def enqueue_qrcode(self, path: str):
+        """
+        Generates the QR code for the schedule in the background.
+
+        The URL is captured right away, the image is rendered by the QR code
+        worker after the current transaction commits.
+
+        Args:
+            path (str): The file path where the QR code image will be saved.
+
+        Returns:
+            None
+        """
+        transaction.on_commit(
+            partial(qr.enqueue, self.generate_url_with_pin(), path)
+        )
 
     def __str__(self) -> str:
         """
@@ -132,31 +417,35 @@ class Schedule(models.Model):
         """
         return str(self.start_time.date())
     
-    def __generate_slots(self) -> list[Slot]:
+    def __generate_slots(self, positions) -> list[Slot]:
         """
         Generates slots for the schedule.
 
-        Uses the default duration and slot duration from the Settings model to
-        create and save individual Slot instances for the schedule.
+        The time between the start and end time of the schedule is split into
+        slots of the schedule's slot duration, numbered from 0. The slots are
+        not saved.
+
+        Args:
+            positions (Iterable[int]): The positions of the slots to generate.
 
         Returns:
-            list[Slot]: A list of generated Slot instances.
+            list[Slot]: A list of unsaved Slot instances.
         """
-        number_of_slots = int(
-            Settings.load().default_duration.total_seconds() / Settings.load().default_slot_duration.total_seconds()
-        )
-        slots = []
-        for i in range(number_of_slots):
-            slot = Slot(
-                start_time=(
-                    self.start_time
-                    # datetime.combine(
-                    #     datetime(1, 1, 1),
-                    #     Settings.load().default_start_time
-                    # )
-                      + timedelta(minutes=i * 30)
-                ).time()
+        return [
+            Slot(
+                schedule=self,
+                position=position,
+                start_time=self.slot_start_time(position),
             )
-            slot.save()
-            slots.append(slot)
-        return slots
+            for position in positions
+        ]
+
+
+def as_aware(value):
+    """
+    Returns datetimes as aware datetimes in the current time zone, the way
+    they are stored, and other values unchanged.
+    """
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
@@ -1,7 +1,47 @@
+import secrets
+from contextvars import ContextVar
 from datetime import time, timedelta
 
 from django.db import models
 
+
+# Process-local snapshot of the settings row, stored as (version, instance).
+_cache: tuple | None = None
+
+# Marks a request that has not verified the snapshot yet.
+_UNPINNED = object()
+
+# Snapshot pinned for the current request, _UNPINNED inside a request that has
+# not read the settings yet, None outside of a request.
+_request_settings: ContextVar = ContextVar("drummerei_settings", default=None)
+
+
+def pin_settings_for_request(sender, **kwargs):
+    """
+    Marks the start of a request, see Settings.cached().
+
+    Connected to the request_started signal.
+    """
+    _request_settings.set(_UNPINNED)
+
+
+def invalidate_settings_cache(sender, **kwargs):
+    """
+    Drops the cached snapshot when the settings row is deleted.
+
+    Connected to the post_delete signal of Settings.
+    """
+    Settings.invalidate_cache()
+
+
+def release_settings_for_request(sender, **kwargs):
+    """
+    Marks the end of a request, see Settings.cached().
+
+    Connected to the request_finished signal.
+    """
+    _request_settings.set(None)
+
 class Settings(models.Model):
     """
     Application settings.
@@ -19,6 +59,8 @@ class Settings(models.Model):
         default_start_time (time): The default start time for slots.
         default_duration (timedelta): The default duration for schedules.
         default_slot_duration (timedelta): The default duration for individual slots.
+        default_unlock_hours (int): The default number of hours slots unlock in advance.
+        version (int): Incremented on every save, used to invalidate cached snapshots.
     """
 
     class Meta:
@@ -60,33 +102,95 @@ class Settings(models.Model):
         default=1,
         help_text="The number of hours before the start time when slots can be unlocked."
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on every save to invalidate cached settings."
+    )
 
     @classmethod
     def load(cls):
         """
-        Loads or creates the settings instance.
+        Loads the settings instance from the database.
+
+        Returns a fresh instance meant for editing. If the settings row does not
+        exist yet, an unsaved instance with default values and the fixed primary
+        key is returned, so reading never inserts. The row is created on the
+        first save().
 
-        This class method ensures that the settings instance is loaded or created
-        with a fixed primary key to maintain a singleton pattern.
         Returns:
             Settings: The settings instance.
         """
-        obj, _ = cls.objects.get_or_create(id=1)
-        return obj
-    
+        return cls.objects.filter(pk=1).first() or cls(pk=1)
+
+    @classmethod
+    def cached(cls):
+        """
+        Returns a process-local snapshot of the settings.
+
+        The snapshot is shared and must be treated as read-only, use load() to
+        edit the settings. Every save() increments the version of the row, so
+        other worker processes notice the change by comparing versions.
+
+        Outside of a request, every call verifies the version with a single
+        primary key lookup. Inside a request, the snapshot is verified on first
+        use and then pinned until the request finishes.
+
+        Returns:
+            Settings: The cached settings instance.
+        """
+        global _cache
+        pinned = _request_settings.get()
+        if isinstance(pinned, cls):
+            return pinned
+
+        version = cls.objects.filter(pk=1).values_list("version", flat=True).first()
+        cache = _cache
+        if cache is None or cache[0] != version:
+            cache = (version, cls.load())
+            _cache = cache
+
+        if pinned is _UNPINNED:
+            _request_settings.set(cache[1])
+        return cache[1]
+
+    @classmethod
+    def invalidate_cache(cls):
+        """
+        Drops the cached snapshot of this process.
+        """
+        global _cache
+        _cache = None
+        if _request_settings.get() is not None:
+            _request_settings.set(_UNPINNED)
+
     def save(self, *args, **kwargs):
         """
         Saves the settings instance.
 
         Overrides the default save method to ensure the settings instance always
-        has a fixed primary key, maintaining a singleton pattern.
+        has a fixed primary key, maintaining a singleton pattern. Increments the
+        version in the database, so concurrent saves never write the same
+        version, and invalidates the cached snapshot.
+
+        A new row starts at a random version. A row that is deleted and created
+        again, or rolled back and saved again, therefore doesn't repeat a
+        version that a snapshot of another process still holds.
 
         Args:
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
         """
         self.pk = 1
+        adding = self._state.adding
+        if adding:
+            self.version = secrets.randbelow(2**30) + 1
+        else:
+            self.version = models.F("version") + 1
         super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=["version"])
+        self.invalidate_cache()
 
     def __str__(self) -> str:
         """
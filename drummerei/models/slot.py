@@ -2,8 +2,10 @@ from datetime import time, datetime, timedelta
 from enum import Enum
 from uuid import UUID,uuid4
 
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, transaction
 
+from .change import SlotChange
 from .settings import Settings
 
 
@@ -18,7 +20,154 @@ def generate_start_time() -> time:
     Returns:
         time: The default start time as specified in the Settings model.
     """
-    return Settings.load().default_start_time
+    return Settings.cached().default_start_time
+
+
+class SlotAlreadyReserved(Exception):
+    """
+    Raised when a slot has been reserved by someone else in the meantime.
+    """
+
+
+class SlotAlreadyHeld(Exception):
+    """
+    Raised when a visitor tries to reserve a second slot of a schedule.
+    """
+
+
+class SlotQuerySet(models.QuerySet):
+    def reserve(self, name: str, slot_id: UUID) -> int:
+        """
+        Reserves the slots of the queryset that are not reserved yet.
+
+        The check and the write happen in a single conditional UPDATE, so of
+        several concurrent reservations of the same slot exactly one succeeds.
+        Successful reservations are recorded in the SlotChange log.
+
+        Args:
+            name (str): The name to assign to the slots.
+            slot_id (UUID): The unique identifier of the visitor.
+
+        Returns:
+            int: The number of slots that have been reserved.
+
+        Raises:
+            SlotAlreadyHeld: If the visitor already holds a slot of the schedule.
+        """
+        try:
+            with transaction.atomic():
+                count = self.filter(slot_id__isnull=True).update(name=name, slot_id=slot_id)
+                if count:
+                    SlotChange.record_slots(self.filter(slot_id=slot_id))
+        except IntegrityError:
+            # the unique constraint on schedule and slot_id
+            raise SlotAlreadyHeld(f"Visitor {slot_id} already holds a slot")
+        return count
+
+    async def areserve(self, name: str, slot_id: UUID) -> int:
+        """
+        Asynchronous version of reserve().
+
+        Transactions are not available in async code, so the reservation runs
+        in a thread like the other writes of the async ORM.
+        """
+        return await sync_to_async(self.reserve)(name, slot_id)
+
+    def apply(self, operations: list[tuple["Slot.Operation", int, str | None]]) -> list["Slot"]:
+        """
+        Applies a batch of operations to the slots of the queryset.
+
+        The operations are applied in order and either all or none of them are
+        written. They are folded into the final name and slot ID of every slot
+        and written with at most two UPDATEs: one for the slots that are
+        reserved without being cleared first, conditional on them being free
+        like reserve(), and one for the others. SQLite has no row locks, so the
+        affected row counts decide whether a concurrent reservation came first.
+        The changes are recorded in the SlotChange log.
+
+        Args:
+            operations (list[tuple[Slot.Operation, int, str | None]]): Triples of
+                operation, slot ID and name. The name is ignored when clearing.
+
+        Returns:
+            list[Slot]: The changed slots, ordered by ID.
+
+        Raises:
+            Slot.DoesNotExist: If a slot is not part of the queryset.
+            SlotAlreadyReserved: If a slot to reserve is already reserved.
+        """
+        # final field values per slot, and whether the slot must be free
+        values: dict[int, dict] = {}
+        reserved: dict[int, bool] = {}
+        must_be_free: set[int] = set()
+        for operation, id, name in operations:
+            fields = values.setdefault(id, {})
+            if operation == Slot.Operation.RESERVE:
+                if reserved.get(id):
+                    raise SlotAlreadyReserved(f"Slot {id} is already reserved")
+                if id not in reserved:
+                    must_be_free.add(id)
+                fields.update(name=name, slot_id=uuid4())
+                reserved[id] = True
+            elif operation == Slot.Operation.CLEAR:
+                fields.update(name=None, slot_id=None)
+                reserved[id] = False
+            elif operation == Slot.Operation.RENAME:
+                fields["name"] = name
+
+        with transaction.atomic():
+            free = self.filter(pk__in=must_be_free, slot_id__isnull=True)
+            if self._update_each(free, values, must_be_free) != len(must_be_free):
+                self._raise_missing(must_be_free, operations)
+                # the slots that got another slot ID than the one just written
+                taken = self.filter(pk__in=must_be_free).order_by("pk").values_list("pk", "slot_id")
+                for id, slot_id in taken:
+                    if slot_id != values[id]["slot_id"]:
+                        raise SlotAlreadyReserved(f"Slot {id} is already reserved")
+            others = set(values) - must_be_free
+            if self._update_each(self.filter(pk__in=others), values, others) != len(others):
+                self._raise_missing(others, operations)
+
+            changed = list(self.filter(pk__in=values).order_by("id"))
+            SlotChange.record([
+                (slot.id, slot.schedule_id) for slot in changed if slot.schedule_id is not None
+            ])
+        return changed
+
+    def _update_each(self, queryset: "SlotQuerySet", values: dict[int, dict], ids: set[int]) -> int:
+        """
+        Writes different values to each slot in one UPDATE.
+
+        Returns:
+            int: The number of updated rows.
+        """
+        if not ids:
+            return 0
+        fields = {}
+        for field in ("name", "slot_id"):
+            cases = [
+                models.When(pk=id, then=models.Value(values[id][field], self.model._meta.get_field(field)))
+                for id in sorted(ids) if field in values[id]
+            ]
+            if cases:
+                fields[field] = models.Case(*cases, default=models.F(field))
+        return queryset.update(**fields)
+
+    def _raise_missing(self, ids: set[int], operations: list) -> None:
+        """
+        Raises DoesNotExist for the first operation on a slot that is not part
+        of the queryset.
+        """
+        existing = set(self.filter(pk__in=ids).values_list("pk", flat=True))
+        for _, id, _ in operations:
+            if id in ids and id not in existing:
+                raise self.model.DoesNotExist(f"Slot {id} does not exist")
+
+    async def aapply(self, operations: list[tuple["Slot.Operation", int, str | None]]) -> list["Slot"]:
+        """
+        Asynchronous version of apply().
+        """
+        return await sync_to_async(self.apply)(operations)
 
 
 class Slot(models.Model):
@@ -29,42 +178,133 @@ class Slot(models.Model):
     and unique identifier.
 
     Attributes:
+        schedule (Schedule): The schedule the slot belongs to.
+        position (int): The index of the slot within its schedule.
         name (str): The name of the slot.
         start_time (time): The start time of the slot.
         slot_id (UUID): A unique identifier for the slot.
     """
 
+    schedule = models.ForeignKey(
+        "Schedule",
+        on_delete=models.CASCADE,
+        related_name="slots",
+        null=True,
+        blank=True,
+    )
+    position = models.IntegerField(default=0)
     name = models.CharField(max_length=255,null=True)
     start_time = models.TimeField(default=generate_start_time)
     slot_id = models.UUIDField(null=True, blank=True)
 
-    class Status(Enum):
-        AVAILABLE = 1
-        UNAVAILABLE = 2
-        RESERVED = 3
+    objects = SlotQuerySet.as_manager()
 
-    def get_status(self) -> Status:
-        if self.is_locked():
-            return self.Status.UNAVAILABLE
-        elif self.slot_id is None:
-            return self.Status.RESERVED
+    class Meta:
+        ordering = ["position", "id"]
+        constraints = [
+            # one slot per visitor and schedule, also the index of slot_held_by()
+            models.UniqueConstraint(
+                fields=["schedule", "slot_id"], name="slot_schedule_slot_id_unique",
+            ),
+        ]
+
+    class Status(str, Enum):
+        AVAILABLE = "available"
+        LOCKED = "locked"
+        RESERVED = "reserved"
+        OWN = "own"
+
+    class Operation(str, Enum):
+        RESERVE = "reserve"
+        CLEAR = "clear"
+        RENAME = "rename"
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the slot and records the change in the SlotChange log.
+
+        Returns:
+            None
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.schedule_id is not None:
+                SlotChange.record([(self.id, self.schedule_id)])
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the slot and records the change in the SlotChange log.
+
+        Returns:
+            tuple: The number of deleted objects, see Model.delete().
+        """
+        change = (self.id, self.schedule_id)
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            if change[1] is not None:
+                SlotChange.record([change])
+        return deleted
+
+    def get_status(
+        self,
+        now: datetime | None = None,
+        slot_id: str | None = None,
+        holds_slot: bool = False,
+    ) -> Status:
+        """
+        Returns the status of the slot as shown to a visitor.
+
+        Args:
+            now (datetime, optional): The point in time to check against.
+                Defaults to the current time.
+            slot_id (str, optional): The slot ID stored in the visitor's cookie.
+            holds_slot (bool, optional): Whether the visitor already holds a
+                slot of the schedule.
+
+        Returns:
+            Status: LOCKED if the slot is not available at the given time or if
+            it is free but the visitor already holds a slot, OWN if it is reserved
+            by the visitor, RESERVED if it is reserved by someone else and
+            AVAILABLE otherwise.
+        """
+        if not self.is_available(now):
+            return self.Status.LOCKED
+        elif not self.is_reserved():
+            return self.Status.LOCKED if holds_slot else self.Status.AVAILABLE
+        elif slot_id is not None and str(self.slot_id) == str(slot_id):
+            return self.Status.OWN
         else:
-            return self.Status.AVAILABLE
+            return self.Status.RESERVED
 
     def is_reserved(self) -> bool:
         return self.slot_id is not None
 
-    def is_available(self) -> bool:
-        if self.schedule_set.count() > 0: # exists()
-            schedule = self.schedule_set.first()
-            time_limit = datetime.now() + timedelta(
-                        hours=schedule.unlock_hours
+    def is_available(self, now: datetime | None = None) -> bool:
+        """
+        Checks if the slot is within the unlock window of its schedule.
+
+        Args:
+            now (datetime, optional): The point in time to check against.
+                Defaults to the current time.
+
+        Returns:
+            bool: True if the slot starts after now and within the unlock hours
+            of its schedule.
+
+        Raises:
+            ValueError: If the slot is not assigned to any schedule.
+        """
+        if self.schedule is not None:
+            if now is None:
+                now = datetime.now()
+            time_limit = now + timedelta(
+                        hours=self.schedule.unlock_hours
                     )
             slot_start_time = datetime.combine(
-                            datetime.now(),
+                            now,
                             self.start_time
                         )
-            return slot_start_time > datetime.now() and slot_start_time < time_limit #and not self.is_reserved()
+            return slot_start_time > now and slot_start_time < time_limit #and not self.is_reserved()
 
         else:
             raise ValueError("Slot is not assigned to any schedule")
@@ -74,16 +314,21 @@ class Slot(models.Model):
         Reserves the slot with the given name and generates a unique identifier.
 
         This method updates the name of the slot with the provided value and 
-        generates a unique identifier for the slot. The changes are then saved to 
-        the database.
+        generates a unique identifier for the slot. The changes are written to 
+        the database with a conditional update that only succeeds if the slot
+        is not reserved yet.
         Args:
             name (str): The name to assign to the slot.
         Returns:
             UUID: The unique identifier for the slot.
+        Raises:
+            SlotAlreadyReserved: If the slot is already reserved.
         """
+        slot_id = uuid4()
+        if not Slot.objects.filter(pk=self.pk).reserve(name, slot_id):
+            raise SlotAlreadyReserved(f"Slot {self.pk} is already reserved")
         self.name = name
-        self.slot_id = uuid4()
-        self.save()
+        self.slot_id = slot_id
         return self.slot_id
 
     def clear_slot_with_id(self, slot_id: UUID):
@@ -122,6 +367,12 @@ class Slot(models.Model):
         self.slot_id = None
         self.save()
 
+    async def aclear_slot(self):
+        """
+        Asynchronous version of clear_slot().
+        """
+        await sync_to_async(self.clear_slot)()
+
     def __str__(self) -> str:
         """
         Returns the string representation of the slot.
@@ -131,8 +382,4 @@ class Slot(models.Model):
         Returns:
             str: The string representation of the slot.
         """
-        schedule = None
-        all_schedules = self.schedule_set.all()
-        if all_schedules.exists():
-            schedule = all_schedules.first()
-        return f"{schedule} @ {self.start_time}: {self.name}"
\ No newline at end of file
+        return f"{self.schedule} @ {self.start_time}: {self.name}"
\ No newline at end of file
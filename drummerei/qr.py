@@ -0,0 +1,129 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_for
+from functools import lru_cache
+from threading import Lock
+
+import qrcode
+import qrcode.image.svg
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# A single worker keeps the writes to one path in submission order.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="drummerei-qr")
+_pending: set[Future] = set()
+_lock = Lock()
+
+
+def content_hash(data: str, format: str) -> str:
+    """
+    Returns a hash identifying the QR code image for the given data and format.
+
+    Args:
+        data (str): The data encoded in the QR code.
+        format (str): The image format, one of CONTENT_TYPES.
+
+    Returns:
+        str: The hex digest, usable as an ETag.
+    """
+    return hashlib.sha256(f"{format}:{data}".encode()).hexdigest()[:32]
+
+
+@lru_cache(maxsize=128)
+def encode(data: str, format: str) -> bytes:
+    """
+    Renders a QR code image.
+
+    Results are kept in an LRU cache, so repeated requests for the same
+    schedule don't re-encode the image. SVG images are rendered without Pillow.
+
+    Args:
+        data (str): The data encoded in the QR code.
+        format (str): The image format, one of CONTENT_TYPES.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if format == "svg":
+        return qrcode.make(
+            data, image_factory=qrcode.image.svg.SvgPathFillImage
+        ).to_string()
+    buffer = io.BytesIO()
+    qrcode.make(data).save(buffer)
+    return buffer.getvalue()
+
+
+def write_qrcode(data: str, path: str):
+    """
+    Renders a QR code and writes it to the given path atomically.
+
+    The image is written to a temporary file in the same directory and then
+    renamed, so readers see either the old or the new image, never a partial one.
+
+    Args:
+        data (str): The data encoded in the QR code.
+        path (str): The file path where the PNG image will be saved.
+
+    Returns:
+        None
+    """
+    image = encode(data, "png")
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".qr-", suffix=".png", dir=os.path.dirname(path) or "."
+    )
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(image)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def enqueue(data: str, path: str) -> Future:
+    """
+    Schedules a QR code to be written in the background.
+
+    Args:
+        data (str): The data encoded in the QR code.
+        path (str): The file path where the PNG image will be saved.
+
+    Returns:
+        Future: Completes once the image has been written.
+    """
+    future = _executor.submit(write_qrcode, data, path)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(_done)
+    return future
+
+
+def wait(timeout: float | None = None):
+    """
+    Blocks until all QR codes enqueued so far have been written.
+
+    Args:
+        timeout (float, optional): The maximum number of seconds to wait.
+
+    Returns:
+        None
+    """
+    with _lock:
+        pending = list(_pending)
+    wait_for(pending, timeout)
+
+
+def _done(future: Future):
+    with _lock:
+        _pending.discard(future)
+    if future.exception() is not None:
+        logger.error("Failed to write QR code", exc_info=future.exception())
@@ -0,0 +1,40 @@
+"""
+Per-connection tuning of SQLite databases.
+
+Databases can list PRAGMA statements under the non-standard "PRAGMAS" key of
+their settings, which are applied to every new connection. Most of them,
+like the busy timeout and the cache size, only last as long as the
+connection; the journal mode is stored in the database file.
+"""
+
+import re
+
+# PRAGMA statements don't take parameters, names and values are checked instead
+PRAGMA_TOKEN = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Applies the configured PRAGMA statements to a new database connection.
+
+    Connected to the connection_created signal.
+
+    Args:
+        sender (type): The database wrapper class.
+        connection (BaseDatabaseWrapper): The new connection.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If a PRAGMA name or value is invalid.
+    """
+    pragmas = connection.settings_dict.get("PRAGMAS")
+    if connection.vendor != "sqlite" or not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not PRAGMA_TOKEN.match(name) or not PRAGMA_TOKEN.match(str(value)):
+                raise ValueError(f"Invalid PRAGMA {name}={value}")
+            cursor.execute(f"PRAGMA {name} = {value}")
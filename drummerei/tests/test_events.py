@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase
+
+from .. import events
+from ..models.change import SlotChange
+from ..models.settings import Settings
+from ..models.schedule import Schedule
+
+class SlotChangeTest(TestCase):
+    def setUp(self):
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create(
+            start_time=datetime.now(),
+            end_time=datetime.now() + timedelta(hours=4),
+        )
+
+    def test_generated_slots_are_not_recorded(self):
+        self.assertFalse(SlotChange.objects.exists())
+
+    def test_reserve_is_recorded(self):
+        slot = self.schedule.slots.first()
+        slot.reserve("TestDJ")
+        change = SlotChange.objects.get()
+        self.assertEqual(change.slot_id, slot.id)
+        self.assertEqual(change.schedule_id, self.schedule.id)
+
+    def test_save_is_recorded(self):
+        slot = self.schedule.slots.first()
+        slot.clear_slot()
+        self.assertEqual(SlotChange.objects.filter(slot=slot).count(), 1)
+
+    def test_events_need_asgi(self):
+        response = self.client.get(f"/{self.schedule}/events")
+        self.assertEqual(response.status_code, 204)
+
+    def test_slot_row(self):
+        slot = self.schedule.slots.first()
+        slot.reserve("TestDJ")
+        response = self.client.get(f"/{self.schedule}/slots/{slot.id}/")
+        self.assertContains(response, f'id="slot-{slot.id}"')
+        self.assertContains(response, "TestDJ")
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create(
+            start_time=datetime.now(),
+            end_time=datetime.now() + timedelta(hours=4),
+        )
+        self.slot = self.schedule.slots.first()
+
+    async def test_stream(self):
+        stream = events.stream(self.schedule.id)
+        self.assertEqual(await anext(stream), "retry: 2000\n\n")
+
+        await self.slot.asave()
+        event = await asyncio.wait_for(anext(stream), 5)
+        self.assertIn("event: slot\n", event)
+        self.assertIn(f'"slot": {self.slot.id}', event)
+        await stream.aclose()
+        self.assertFalse(events.get_tail().subscribers)
+
+    async def test_replay(self):
+        await self.slot.asave()
+        stream = events.stream(self.schedule.id, last_event_id=0)
+        await anext(stream)
+        event = await asyncio.wait_for(anext(stream), 5)
+        self.assertIn(f'"slot": {self.slot.id}', event)
+        await stream.aclose()
+
+    async def test_slow_stream_is_closed(self):
+        with mock.patch.object(events, "QUEUE_SIZE", 2):
+            stream = events.stream(self.schedule.id)
+            await anext(stream)
+
+        # the stream is not read while three changes arrive
+        for _ in range(3):
+            await self.slot.asave()
+        tail = events.get_tail()
+        for _ in range(50):
+            if not tail.subscribers:
+                break
+            await asyncio.sleep(events.POLL_INTERVAL / 5)
+        self.assertFalse(tail.subscribers)
+
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), 5)
+
+    async def test_asgi_view(self):
+        response = await self.async_client.get(f"/{self.schedule}/events")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 2000\n\n")
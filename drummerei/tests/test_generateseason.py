@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models.schedule import Schedule
+from ..models.settings import Settings
+
+
+class GenerateSeasonTest(TestCase):
+    def setUp(self):
+        settings = Settings.load()
+        settings.default_qr_code_path = "drummerei/static/image/test.png"
+        settings.save()
+        Settings.invalidate_cache()
+
+    def generate(self, *args) -> str:
+        stdout = StringIO()
+        call_command("generateseason", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_weekly_nights(self):
+        self.generate(
+            "--from", "2027-01-01", "--until", "2027-01-31",
+            "--start-time", "20:00", "--duration", "120", "--slot-duration", "30",
+            "--skip", "2027-01-15",
+            "--override", "2027-01-22=22:00-01:00",
+        )
+
+        schedules = list(Schedule.objects.order_by("start_time"))
+        self.assertEqual(
+            [schedule.date for schedule in schedules],
+            [date(2027, 1, 1), date(2027, 1, 8), date(2027, 1, 22), date(2027, 1, 29)],
+        )
+        self.assertEqual(schedules[0].slots.count(), 4)
+        self.assertEqual(
+            [slot.position for slot in schedules[0].slots.all()], [0, 1, 2, 3]
+        )
+        # the override ends after midnight
+        self.assertEqual(schedules[2].end_time - schedules[2].start_time, timedelta(hours=3))
+        self.assertEqual(schedules[2].slots.count(), 6)
+        self.assertEqual(schedules[2].slots.first().start_time.strftime("%H:%M"), "22:00")
+
+    def test_existing_dates_are_kept(self):
+        self.generate("--from", "2027-01-01", "--until", "2027-01-15")
+        ids = set(Schedule.objects.values_list("id", flat=True))
+
+        output = self.generate("--from", "2027-01-01", "--until", "2027-01-22")
+
+        self.assertIn("Created 1 schedules", output)
+        self.assertIn("skipped 3 existing dates", output)
+        self.assertLessEqual(ids, set(Schedule.objects.values_list("id", flat=True)))
+        self.assertEqual(Schedule.objects.count(), 4)
+
+    def test_bulk_inserts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.generate("--from", "2028-01-01")
+
+        self.assertEqual(Schedule.objects.filter(date__year=2028).count(), 52)
+        # inserts are batched by the database's parameter limit
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(
+            len([query for query in queries.captured_queries if "SAVEPOINT" in query["sql"]]), 2
+        )
+
+    def test_home_page_lists_new_schedules(self):
+        first = timezone.localdate() + timedelta(days=1)
+        self.generate("--from", str(first), "--until", str(first + timedelta(days=6)))
+        # the command runs in its own process and can't touch the servers' caches
+        cache.clear()
+        self.assertContains(self.client.get("/"), f'href="/{first}"')
+
+    def test_qr_codes_are_served(self):
+        self.generate("--from", "2027-01-01", "--until", "2027-01-08")
+        for format in ("png", "svg"):
+            response = self.client.get(f"/2027-01-08/qr.{format}")
+            self.assertEqual(response.status_code, 200)
@@ -0,0 +1,52 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ..management.commands.loadtest import Command
+
+
+class LoadTestCompareTest(SimpleTestCase):
+    def results(self, **metrics) -> dict:
+        summary = {
+            "p50_ms": 10.0,
+            "p95_ms": 20.0,
+            "p99_ms": 30.0,
+            "errors": 0,
+            "queries_per_request": 3.0,
+            **metrics,
+        }
+        return {"endpoints": {"all": summary}}
+
+    def test_within_tolerance(self):
+        Command(stdout=StringIO()).compare(self.results(p95_ms=23.0), self.results(), 0.2)
+
+    def test_regressions(self):
+        for metrics in ({"p99_ms": 40.0}, {"errors": 1}, {"queries_per_request": 4.0}):
+            with self.assertRaises(CommandError):
+                Command(stdout=StringIO()).compare(self.results(**metrics), self.results(), 0.2)
+
+
+class LoadTestCommandTest(TransactionTestCase):
+    def test_smoke(self):
+        with tempfile.TemporaryDirectory() as dir:
+            output = Path(dir) / "results.json"
+            # the command runs against the test database of this test
+            with mock.patch.object(connection.creation, "create_test_db"), \
+                    mock.patch.object(connection.creation, "destroy_test_db"):
+                call_command(
+                    "loadtest", visitors=4, slots=8, concurrency=2, output=output,
+                    stdout=StringIO(),
+                )
+            results = json.loads(output.read_text())
+
+        reserve = results["endpoints"]["reserve"]
+        self.assertEqual(results["endpoints"]["all"]["errors"], 0)
+        # every visitor finds a free slot
+        self.assertEqual(reserve["requests"] - reserve["conflicts"], 4)
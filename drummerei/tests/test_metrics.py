@@ -0,0 +1,84 @@
+import re
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.metrics import Histogram
+
+from ..models.settings import Settings
+from ..models.schedule import Schedule
+
+
+class HistogramTest(SimpleTestCase):
+    def test_render(self):
+        histogram = Histogram("test_seconds", "Test.", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(("/", "GET"), value)
+
+        self.assertEqual(histogram.render(("route", "method"))[2:], [
+            'test_seconds_bucket{route="/",method="GET",le="0.1"} 2',
+            'test_seconds_bucket{route="/",method="GET",le="1.0"} 3',
+            'test_seconds_bucket{route="/",method="GET",le="+Inf"} 4',
+            'test_seconds_sum{route="/",method="GET"} 5.65',
+            'test_seconds_count{route="/",method="GET"} 4',
+        ])
+
+
+class TimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create(
+            start_time=datetime.now(),
+            end_time=datetime.now() + timedelta(hours=4),
+        )
+
+    def server_timing(self, response) -> dict:
+        return {
+            name: (float(duration), description)
+            for name, duration, description in re.findall(
+                r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response["Server-Timing"]
+            )
+        }
+
+    def test_server_timing(self):
+        timing = self.server_timing(self.client.get(f"/{self.schedule}/"))
+        self.assertGreaterEqual(timing["total"][0], timing["db"][0] + timing["tpl"][0])
+        self.assertGreater(timing["tpl"][0], 0)
+        self.assertNotEqual(timing["db"][1], "0 queries")
+
+    async def test_async_queries_are_counted(self):
+        response = await self.async_client.get(f"/api/schedules/{self.schedule.id}/slots")
+        self.assertNotEqual(self.server_timing(response)["db"][1], "0 queries")
+
+    def test_metrics(self):
+        self.client.get(f"/{self.schedule}/")
+        self.client.get("/favicon.ico")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn('drummerei_request_duration_seconds_count{route="<date:date>/",method="GET"}', content)
+        self.assertIn('drummerei_request_queries_bucket{route="unmatched",method="GET",le="0"}', content)
+
+    def test_unknown_methods(self):
+        self.client.generic("FOO", f"/{self.schedule}/")
+        content = self.client.get("/metrics").content.decode()
+        self.assertIn('route="<date:date>/",method="other"', content)
+        self.assertNotIn('method="FOO"', content)
+
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.1").status_code, 403)
+        # a proxy on the same host
+        self.assertEqual(
+            self.client.get("/metrics", headers={"X-Forwarded-For": "203.0.113.1"}).status_code, 403,
+        )
+        with override_settings(METRICS_TOKEN="secret"):
+            for authorization, status in (("Bearer secret", 200), ("Bearer wrong", 403)):
+                response = self.client.get(
+                    "/metrics", REMOTE_ADDR="203.0.113.1", headers={"Authorization": authorization},
+                )
+                self.assertEqual(response.status_code, status)
@@ -0,0 +1,150 @@
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models.settings import Settings
+from ..models.schedule import Schedule
+from ..models.slot import Slot
+
+# slot counts of the fixture schedules, with the default slot duration of 30 minutes
+SLOT_COUNTS = (8, 12, 16, 24)
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every view, API route and admin changelist runs a fixed number of queries,
+    no matter how many schedules and slots there are.
+
+    The fixture holds weekly schedules with 8 to 24 slots, every third slot
+    reserved. Budgets are measured with cold caches. Routes of a single
+    schedule are checked against the smallest and the largest schedule.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        settings = Settings.load()
+        settings.default_qr_code_path = "drummerei/static/image/test.png"
+        settings.save()
+
+        start_time = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+        cls.schedules = []
+        for week in range(12):
+            slot_count = SLOT_COUNTS[week % len(SLOT_COUNTS)]
+            schedule_start = start_time + timedelta(weeks=week - 4)
+            cls.schedules.append(Schedule.objects.create(
+                start_time=schedule_start,
+                end_time=schedule_start + timedelta(minutes=30 * slot_count),
+            ))
+
+        slots = list(Slot.objects.order_by("id"))
+        for slot in slots[::3]:
+            slot.name = f"DJ {slot.id}"
+            slot.slot_id = uuid4()
+        Slot.objects.bulk_update(slots[::3], ["name", "slot_id"])
+
+        cls.small = min(cls.schedules, key=lambda schedule: schedule.slots.count())
+        cls.large = max(cls.schedules, key=lambda schedule: schedule.slots.count())
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "admin")
+
+    def setUp(self):
+        cache.clear()
+        Settings.invalidate_cache()
+
+    def assertMaxQueries(self, budget: int, request, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args, **kwargs)
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(
+            len(queries), budget,
+            "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        return response
+
+    def json(self, data: dict) -> dict:
+        return {"data": json.dumps(data), "content_type": "application/json"}
+
+    def test_home(self):
+        self.assertMaxQueries(2, self.client.get, "/")
+        # the cache key is read from the database
+        self.assertMaxQueries(1, self.client.get, "/")
+        self.assertMaxQueries(2, self.client.get, "/archive/")
+
+    def test_schedule(self):
+        for schedule in (self.small, self.large):
+            cache.clear()
+            self.assertMaxQueries(4, self.client.get, f"/{schedule}/")
+            self.assertMaxQueries(4, self.client.get, f"/{schedule}/?pin={schedule.pin}")
+
+            # visitors holding a slot get an uncached page
+            slot = schedule.slots.filter(slot_id__isnull=False).first()
+            self.client.cookies["drummerei_slotId"] = str(slot.slot_id)
+            self.assertMaxQueries(4, self.client.get, f"/{schedule}/?pin={schedule.pin}")
+            self.client.cookies.clear()
+
+    def test_slot_row(self):
+        for schedule in (self.small, self.large):
+            slot = schedule.slots.last()
+            self.assertMaxQueries(2, self.client.get, f"/{schedule}/slots/{slot.id}/")
+
+    def test_edit_slot(self):
+        for schedule in (self.small, self.large):
+            slot = schedule.slots.last()
+            self.assertMaxQueries(
+                7, self.client.post, f"/{schedule}/slots/{slot.id}/edit",
+                {"name": "TestDJ", "pin": schedule.pin, "update": "1"},
+            )
+
+    def test_reserve_slot(self):
+        for schedule in (self.small, self.large):
+            slot = schedule.slots.filter(slot_id__isnull=True).last()
+            self.assertMaxQueries(
+                7, self.client.post, f"/{schedule}/slots/{slot.id}/reserve",
+                {"name": "TestDJ", "pin": schedule.pin},
+            )
+
+    def test_qrcode(self):
+        self.assertMaxQueries(3, self.client.get, f"/{self.large}/qr.svg")
+
+    def test_api_schedules(self):
+        self.assertMaxQueries(2, self.client.get, "/api/schedules")
+        self.assertMaxQueries(2, self.client.get, "/api/schedules?upcoming=true&limit=3")
+        for schedule in (self.small, self.large):
+            self.assertMaxQueries(2, self.client.get, f"/api/schedules/{schedule.id}")
+            self.assertMaxQueries(2, self.client.get, f"/api/schedules/{schedule.date}/lineup")
+
+    def test_api_slots(self):
+        for schedule in (self.small, self.large):
+            path = f"/api/schedules/{schedule.id}/slots"
+            slot = schedule.slots.filter(slot_id__isnull=True).last()
+            self.assertMaxQueries(2, self.client.get, path)
+            self.assertMaxQueries(2, self.client.get, f"{path}/{slot.id}")
+            self.assertMaxQueries(
+                8, self.client.patch, f"{path}/{slot.id}/reserve",
+                **self.json({"name": "TestDJ", "pin": schedule.pin}),
+            )
+            self.assertMaxQueries(
+                7, self.client.patch, f"{path}/{slot.id}/clear",
+                **self.json({"pin": schedule.pin}),
+            )
+
+    def test_api_batch(self):
+        for schedule in (self.small, self.large):
+            operations = [
+                {"op": "rename", "id": slot.id, "name": "TestDJ"}
+                for slot in schedule.slots.all()
+            ]
+            self.assertMaxQueries(
+                7, self.client.patch, f"/api/schedules/{schedule.id}/slots",
+                **self.json({"pin": schedule.pin, "operations": operations}),
+            )
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+        for path in ("/admin/drummerei/schedule/", "/admin/drummerei/slot/", "/admin/drummerei/settings/"):
+            self.assertMaxQueries(5, self.client.get, path)
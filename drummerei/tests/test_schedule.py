@@ -1,9 +1,18 @@
 from datetime import datetime, timedelta
+import os
 
+from PIL import Image
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from .. import qr
+from ..models.change import SlotChange
 from ..models.settings import Settings
 from ..models.schedule import Schedule, generate_pin
+from ..models.slot import Slot
 
 class HelperFunctionsTest(TestCase):
     def test_generate_pin(self):
@@ -18,10 +27,11 @@ class ScheduleModelTest(TestCase):
         self.settings.default_qr_code_path = "drummerei/static/image/test.png"
         self.settings.url = "http://localhost:8000"
         self.settings.save()
-        self.schedule = Schedule.objects.create(
-            start_time=self.start_time,
-            end_time=self.end_time,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule = Schedule.objects.create(
+                start_time=self.start_time,
+                end_time=self.end_time,
+            )
 
     def test_creation(self):
         self.assertEqual(self.schedule.start_time, self.start_time)
@@ -32,6 +42,11 @@ class ScheduleModelTest(TestCase):
         
         self.assertEqual(str(self.schedule), str(self.schedule.start_time.date()))
 
+    def test_delete_cascades_to_slots(self):
+        slot_ids = list(self.schedule.slots.values_list("id", flat=True))
+        self.schedule.delete()
+        self.assertFalse(Slot.objects.filter(id__in=slot_ids).exists())
+
     def test_generate_url_with_pin(self):
         self.assertEqual(
             self.schedule.generate_url_with_pin(),
@@ -42,6 +57,218 @@ class ScheduleModelTest(TestCase):
         from PIL import Image
         from pyzbar import pyzbar
 
+        qr.wait()
         img = Image.open(Settings.load().default_qr_code_path)
         output = pyzbar.decode(img)[0].data.decode("utf-8")
         self.assertEqual(output, self.schedule.generate_url_with_pin())
+
+class QRCodeWorkerTest(TestCase):
+    def setUp(self):
+        self.path = "drummerei/static/image/test-worker.png"
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = self.path
+        self.settings.save()
+
+    def tearDown(self):
+        qr.wait()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_enqueued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Schedule.objects.create()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(os.path.exists(self.path))
+
+        callbacks[0]()
+        qr.wait()
+        with Image.open(self.path) as img:
+            self.assertEqual(img.format, "PNG")
+
+        leftovers = [
+            name for name in os.listdir(os.path.dirname(self.path))
+            if name.startswith(".qr-")
+        ]
+        self.assertEqual(leftovers, [])
+
+    def test_pin_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule = Schedule.objects.create()
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule.save()
+        self.assertEqual(len(callbacks), 0)
+
+        schedule.pin += 1
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule.save()
+        self.assertEqual(len(callbacks), 1)
+
+
+class SlotGenerationTest(TestCase):
+    def setUp(self):
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.default_slot_duration = timedelta(minutes=12)
+        self.settings.save()
+        Settings.cached() # warm up the settings snapshot
+        self.start_time = datetime.now()
+
+    def create_schedule(self, hours: int) -> Schedule:
+        return Schedule.objects.create(
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=hours),
+        )
+
+    def test_slot_duration(self):
+        schedule = self.create_schedule(hours=4)
+        self.assertEqual(schedule.slots.count(), 20)
+        times = [
+            datetime.combine(self.start_time.date(), slot.start_time)
+            for slot in schedule.slots.order_by("id")
+        ]
+        self.assertEqual(times[1] - times[0], timedelta(minutes=12))
+
+    def test_constant_number_of_queries(self):
+        with CaptureQueriesContext(connection) as short_night:
+            self.create_schedule(hours=1)
+        with CaptureQueriesContext(connection) as long_night:
+            self.create_schedule(hours=8)
+
+        self.assertEqual(len(short_night), len(long_night))
+        self.assertLessEqual(len(long_night), 10)
+
+
+class SlotReconciliationTest(TestCase):
+    def setUp(self):
+        settings = Settings.load()
+        settings.default_qr_code_path = "drummerei/static/image/test.png"
+        settings.save()
+        Settings.invalidate_cache()
+        self.start_time = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+        self.schedule = Schedule.objects.create(
+            start_time=self.start_time,
+            end_time=self.start_time + timedelta(hours=2),
+            slot_duration=timedelta(minutes=30),
+        )
+        self.reserved = self.schedule.slots.get(position=1)
+        self.reserved.reserve("TestDJ")
+
+    def slot_times(self) -> list[str]:
+        return [slot.start_time.strftime("%H:%M") for slot in self.schedule.slots.all()]
+
+    def changed_slot_ids(self) -> set[int]:
+        return set(SlotChange.objects.filter(schedule=self.schedule).values_list("slot_id", flat=True))
+
+    def test_extend_end_time(self):
+        ids = list(self.schedule.slots.values_list("id", flat=True))
+        self.schedule.end_time += timedelta(hours=1)
+        self.schedule.save()
+
+        self.assertEqual(
+            self.slot_times(),
+            ["20:00", "20:30", "21:00", "21:30", "22:00", "22:30"],
+        )
+        self.assertEqual(list(self.schedule.slots.values_list("id", flat=True))[:4], ids)
+        self.reserved.refresh_from_db()
+        self.assertEqual(self.reserved.name, "TestDJ")
+
+    def test_move_start_time_earlier(self):
+        self.schedule.start_time -= timedelta(hours=1)
+        self.schedule.save()
+
+        self.assertEqual(
+            self.slot_times(),
+            ["19:00", "19:30", "20:00", "20:30", "21:00", "21:30"],
+        )
+        self.reserved.refresh_from_db()
+        self.assertEqual(self.reserved.position, 3)
+        self.assertEqual(self.reserved.start_time.strftime("%H:%M"), "20:30")
+
+    def test_shorten_keeps_reserved_slots(self):
+        self.schedule.start_time += timedelta(hours=1)
+        self.schedule.save()
+
+        # the reserved slot before the new start time stays
+        self.assertEqual(self.slot_times(), ["20:30", "21:00", "21:30"])
+        self.reserved.refresh_from_db()
+        self.assertEqual(self.reserved.position, -1)
+
+    def test_change_slot_duration(self):
+        ids = list(self.schedule.slots.values_list("id", flat=True))
+        self.schedule.slot_duration = timedelta(minutes=20)
+        self.schedule.save()
+
+        self.assertEqual(
+            self.slot_times(),
+            ["20:00", "20:20", "20:40", "21:00", "21:20", "21:40"],
+        )
+        self.assertEqual(list(self.schedule.slots.values_list("id", flat=True))[:4], ids)
+
+    def test_unchanged_times_keep_slots(self):
+        schedule = Schedule.objects.get(id=self.schedule.id)
+        schedule.unlock_hours = 3
+        version = schedule.version
+        with CaptureQueriesContext(connection) as queries:
+            schedule.save()
+
+        # no reads of the old row or the new version and no slot queries
+        statements = [query["sql"] for query in queries.captured_queries]
+        self.assertFalse([sql for sql in statements if "drummerei_slot" in sql])
+        self.assertFalse([sql for sql in statements if 'FROM "drummerei_schedule"' in sql])
+        self.assertEqual(self.schedule.slots.count(), 4)
+
+        # the incremented version is read when it is used
+        with self.assertNumQueries(1):
+            self.assertEqual(schedule.version, version + 1)
+
+    def test_changes_are_recorded(self):
+        ids = set(self.schedule.slots.values_list("id", flat=True))
+        SlotChange.objects.all().delete()
+        version = self.schedule.version
+        # one slot moves out and is deleted, the others move
+        self.schedule.start_time += timedelta(minutes=60)
+        self.schedule.end_time += timedelta(minutes=30)
+        self.schedule.save()
+
+        new_ids = set(self.schedule.slots.values_list("id", flat=True))
+        self.assertEqual(self.changed_slot_ids(), ids | new_ids)
+        self.assertLess(len(new_ids), len(ids | new_ids))
+        self.assertGreater(self.schedule.version, version + 1)
+
+    def test_admin_keeps_reconciled_slots(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "admin")
+        self.client.force_login(admin)
+        slots = list(self.schedule.slots.all())
+        end_time = self.start_time + timedelta(hours=1)
+        data = {
+            "pin": self.schedule.pin,
+            "start_time_0": self.start_time.strftime("%Y-%m-%d"),
+            "start_time_1": self.start_time.strftime("%H:%M:%S"),
+            "end_time_0": end_time.strftime("%Y-%m-%d"),
+            "end_time_1": end_time.strftime("%H:%M:%S"),
+            "unlock_hours": self.schedule.unlock_hours,
+            "slot_duration": "00:20:00",
+            "slots-TOTAL_FORMS": len(slots),
+            "slots-INITIAL_FORMS": len(slots),
+            "slots-MIN_NUM_FORMS": 0,
+            "slots-MAX_NUM_FORMS": 1000,
+        }
+        for i, slot in enumerate(slots):
+            data.update({
+                f"slots-{i}-id": slot.id,
+                f"slots-{i}-schedule": self.schedule.id,
+                f"slots-{i}-start_time": slot.start_time.strftime("%H:%M:%S"),
+                # the inline requires names
+                f"slots-{i}-name": slot.name or f"DJ {i}",
+                f"slots-{i}-slot_id": slot.slot_id or "",
+            })
+        # inline edits of a slot the new times retime and of one beyond the
+        # new end, which must not be written back
+        data["slots-2-name"] = "InlineDJ"
+
+        response = self.client.post(f"/admin/drummerei/schedule/{self.schedule.id}/change/", data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.slot_times(), ["20:00", "20:20", "20:40"])
+        self.assertEqual(self.schedule.slots.get(position=2).name, "InlineDJ")
+        self.assertFalse(Slot.objects.filter(id=slots[3].id).exists())
@@ -1,8 +1,13 @@
 from datetime import datetime, timedelta
 
+from django.db.models import F
 from django.test import TestCase
 
-from ..models.settings import Settings
+from ..models.settings import (
+    Settings,
+    pin_settings_for_request,
+    release_settings_for_request,
+)
 
 class SettingsModelTest(TestCase):
     def setUp(self):
@@ -16,3 +21,58 @@ class SettingsModelTest(TestCase):
         self.assertEqual(self.settings.subtitle, 'Open Decks Timetable')
         self.assertTrue(isinstance(self.settings, Settings))
         self.assertEqual(str(self.settings), self.settings.title)
+
+
+class SettingsCacheTest(TestCase):
+    def test_read_does_not_insert(self):
+        Settings.cached()
+        Settings.load()
+        self.assertFalse(Settings.objects.exists())
+
+    def test_snapshot_is_reused(self):
+        snapshot = Settings.cached()
+        with self.assertNumQueries(1):
+            self.assertIs(Settings.cached(), snapshot)
+
+    def test_save_invalidates(self):
+        settings = Settings.load()
+        settings.title = "Changed"
+        settings.save()
+        self.assertEqual(Settings.cached().title, "Changed")
+
+    def test_version_change_invalidates(self):
+        Settings.load().save()
+        self.assertEqual(Settings.cached().title, "Drummerei")
+
+        # another worker process saves the settings
+        Settings.objects.filter(pk=1).update(title="Changed", version=F("version") + 1)
+        self.assertEqual(Settings.cached().title, "Changed")
+
+    def test_concurrent_saves_increment_version(self):
+        Settings.load().save()
+        first, second = Settings.load(), Settings.load()
+        first.save()
+        second.save()
+        self.assertEqual(second.version, first.version + 1)
+        self.assertEqual(Settings.objects.get(pk=1).version, second.version)
+
+    def test_recreated_row_invalidates(self):
+        settings = Settings.load()
+        settings.title = "Old"
+        settings.save()
+        self.assertEqual(Settings.cached().title, "Old")
+
+        # another process deletes the row and creates it again
+        Settings.objects.all().delete()
+        self.assertEqual(Settings.cached().title, "Drummerei")
+        Settings.objects.create(pk=1, title="New")
+        self.assertEqual(Settings.cached().title, "New")
+
+    def test_pinned_for_request(self):
+        pin_settings_for_request(sender=None)
+        try:
+            snapshot = Settings.cached()
+            with self.assertNumQueries(0):
+                self.assertIs(Settings.cached(), snapshot)
+        finally:
+            release_settings_for_request(sender=None)
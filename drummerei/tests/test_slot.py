@@ -1,9 +1,13 @@
 from datetime import datetime, timedelta
+from threading import Barrier, Thread
+from uuid import uuid4
 
-from django.test import TestCase
+from django.conf import settings
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
 
 from ..models.settings import Settings
-from ..models.slot import Slot, generate_start_time
+from ..models.slot import Slot, SlotAlreadyHeld, SlotAlreadyReserved, generate_start_time
 from ..models.schedule import Schedule
 
 class HelperFunctionsTest(TestCase):
@@ -42,6 +46,27 @@ class SlotModelTest(TestCase):
         self.assertNotEqual(uuid, None)
         self.assertEqual(self.slot.name, name)
 
+    def test_reserve_twice(self):
+        self.slot.reserve("TestDJ")
+        self.assertRaises(SlotAlreadyReserved, self.slot.reserve, "OtherDJ")
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.name, "TestDJ")
+
+    def test_one_slot_per_visitor(self):
+        first, second = self.schedule.slots.all()[:2]
+        visitor_id = uuid4()
+        self.assertEqual(Slot.objects.filter(pk=first.pk).reserve("TestDJ", visitor_id), 1)
+        with self.assertRaises(SlotAlreadyHeld):
+            Slot.objects.filter(pk=second.pk).reserve("TestDJ", visitor_id)
+        second.refresh_from_db()
+        self.assertIsNone(second.slot_id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.schedule.slot_held_by(visitor_id), first)
+        self.assertIsNone(self.schedule.slot_held_by(uuid4()))
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.schedule.slot_held_by(None))
+
     def test_is_reserved(self):
         slot = self.schedule.slots.first()
         self.assertFalse(slot.is_reserved())
@@ -87,3 +112,112 @@ class SlotModelTest(TestCase):
             slot.is_available(),
             f"{slot} vs now: {datetime.now()}"
         )
+
+    def test_get_status(self):
+        now = datetime.now()
+        slot_id = None
+        for slot, status in self.schedule.slot_rows(now=now):
+            self.assertEqual(status, slot.get_status(now))
+            if status == Slot.Status.AVAILABLE:
+                slot_id = slot.reserve("TestDJ")
+                self.assertEqual(slot.get_status(now), Slot.Status.RESERVED)
+                self.assertEqual(slot.get_status(now, str(slot_id)), Slot.Status.OWN)
+        self.assertIsNotNone(slot_id)
+
+
+class SlotReservationRaceTest(TransactionTestCase):
+    """
+    Concurrent writers on the database of the test settings.
+    """
+
+    def setUp(self):
+        self.slot = Slot.objects.create(name=None)
+
+    def connect(self):
+        """
+        Prepares the database connection of a writer thread.
+        """
+
+    def test_exactly_one_winner(self):
+        number_of_threads = 12
+        barrier = Barrier(number_of_threads)
+        results = []
+
+        def reserve(i: int):
+            try:
+                self.connect()
+                barrier.wait()
+                results.append(
+                    Slot.objects.filter(pk=self.slot.pk).reserve(f"DJ {i}", uuid4())
+                )
+            finally:
+                connection.close()
+
+        threads = [Thread(target=reserve, args=(i,)) for i in range(number_of_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), number_of_threads)
+        self.assertEqual(sum(results), 1)
+        self.slot.refresh_from_db()
+        self.assertIsNotNone(self.slot.slot_id)
+
+    def test_batch_against_reserve(self):
+        number_of_threads = 12
+        barrier = Barrier(number_of_threads)
+        results = []
+
+        def reserve(i: int):
+            try:
+                self.connect()
+                barrier.wait()
+                if i % 2:
+                    results.append(
+                        Slot.objects.filter(pk=self.slot.pk).reserve(f"DJ {i}", uuid4())
+                    )
+                else:
+                    try:
+                        Slot.objects.apply([(Slot.Operation.RESERVE, self.slot.pk, f"DJ {i}")])
+                        results.append(1)
+                    except SlotAlreadyReserved:
+                        results.append(0)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=reserve, args=(i,)) for i in range(number_of_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), number_of_threads)
+        self.assertEqual(sum(results), 1)
+        self.slot.refresh_from_db()
+        self.assertIsNotNone(self.slot.slot_id)
+
+
+class ProductionSlotReservationRaceTest(SlotReservationRaceTest):
+    """
+    Concurrent writers with the production profile of the settings: WAL,
+    a busy timeout and transactions that take the write lock when they begin.
+    """
+
+    def setUp(self):
+        super().setUp()
+        production = settings.DATABASE_PROFILES["production"]
+        self.settings_dict = {
+            **connection.settings_dict,
+            "OPTIONS": production["OPTIONS"],
+            "PRAGMAS": production["PRAGMAS"],
+        }
+        # WAL is stored in the database file, the other tests expect the default
+        self.addCleanup(self.reset_journal_mode)
+
+    def connect(self):
+        connections["default"] = connections["default"].__class__(self.settings_dict, alias="default")
+
+    def reset_journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = DELETE")
@@ -0,0 +1,37 @@
+import tempfile
+from pathlib import Path
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+
+class ApplyPragmasTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def connect(self, pragmas: dict):
+        settings_dict = {
+            **connections["default"].settings_dict,
+            "NAME": Path(self.dir.name) / "pragmas.sqlite3",
+            "PRAGMAS": pragmas,
+        }
+        other = connections["default"].__class__(settings_dict, alias="pragmas")
+        self.addCleanup(other.close)
+        return other
+
+    def pragma(self, connection, name: str):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_applied_on_connect(self):
+        other = self.connect({"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000})
+        self.assertEqual(self.pragma(other, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(other, "synchronous"), 1)
+        self.assertEqual(self.pragma(other, "busy_timeout"), 5000)
+
+    def test_invalid(self):
+        other = self.connect({"cache_size": "1; DROP TABLE drummerei_slot"})
+        with self.assertRaises(ValueError):
+            other.ensure_connection()
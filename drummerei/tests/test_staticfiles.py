@@ -0,0 +1,83 @@
+import gzip
+import tempfile
+from pathlib import Path
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.staticfiles import IMMUTABLE_MAX_AGE
+
+from ..models.settings import Settings
+
+
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root.name))
+        cls.addClassCleanup(cls.static_root.cleanup)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def setUp(self):
+        cache.clear()
+        self.css = staticfiles_storage.stored_name("css/bootstrap.min.css")
+        self.original = Path(self.static_root.name, "css/bootstrap.min.css").read_bytes()
+
+    def test_hashed_and_compressed(self):
+        self.assertRegex(self.css, r"^css/bootstrap\.min\.[0-9a-f]{12}\.css$")
+        compressed = Path(self.static_root.name, f"{self.css}.gz").read_bytes()
+        self.assertLess(len(compressed), len(self.original) / 4)
+        self.assertEqual(gzip.decompress(compressed), self.original)
+
+    def test_serve_gzip(self):
+        response = self.client.get(f"/static/{self.css}", headers={"Accept-Encoding": "gzip, deflate"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(f"max-age={IMMUTABLE_MAX_AGE}", response["Cache-Control"])
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.original)
+
+    def test_serve_uncompressed(self):
+        response = self.client.get(f"/static/{self.css}")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), self.original)
+
+    def test_unhashed_names_are_revalidated(self):
+        response = self.client.get("/static/image/README.md")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get(
+            "/static/image/README.md", headers={"If-Modified-Since": response["Last-Modified"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_found(self):
+        for path in ("/static/css/missing.css", "/static/../manage.py", "/static/css/"):
+            self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_templates_use_hashed_names(self):
+        settings = Settings.load()
+        settings.default_qr_code_path = "drummerei/static/image/test.png"
+        settings.save()
+        self.assertContains(self.client.get("/"), f'href="/static/{self.css}"')
+
+    @override_settings(DEBUG=True)
+    def test_hashed_names_with_debug(self):
+        settings = Settings.load()
+        settings.default_qr_code_path = "drummerei/static/image/test.png"
+        settings.save()
+        self.assertContains(self.client.get("/"), f'href="/static/{self.css}"')
+
+        response = self.client.get(f"/static/{self.css}")
+        self.assertIn("immutable", response["Cache-Control"])
+        # the development server finds them as well
+        self.assertEqual(finders.find(self.css), str(Path(self.static_root.name, self.css)))
+        self.assertIsNone(finders.find("css/bootstrap.min.0123456789ab.css"))
@@ -0,0 +1,328 @@
+from datetime import datetime, timedelta
+import re
+from io import BytesIO
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from .. import qr
+
+from ..models.settings import Settings
+from ..models.schedule import Schedule
+from ..views import ARCHIVE_PAGE_SIZE, CSRF_TOKEN_PLACEHOLDER, HOME_SCHEDULE_COUNT
+
+class ScheduleViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+
+    def create_schedule(self, start_time: datetime, hours: int) -> Schedule:
+        return Schedule.objects.create(
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=hours),
+        )
+
+    def test_rows(self):
+        schedule = self.create_schedule(datetime.now() - timedelta(hours=1), 4)
+        response = self.client.get(f"/{schedule}/?pin={schedule.pin}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["kiosk"])
+        statuses = [status for _, status in response.context["rows"]]
+        self.assertEqual(len(statuses), schedule.slots.count())
+        self.assertIn("available", statuses)
+        self.assertIn("locked", statuses)
+
+    def test_constant_number_of_queries(self):
+        short_night = self.create_schedule(datetime.now() - timedelta(days=1), 2)
+        long_night = self.create_schedule(datetime.now() - timedelta(days=2), 8)
+
+        Settings.cached() # warm up the settings snapshot
+        self.client.cookies["drummerei_slotId"] = str(uuid4())
+        with CaptureQueriesContext(connection) as short_queries:
+            self.client.get(f"/{short_night}/?pin={short_night.pin}")
+        with CaptureQueriesContext(connection) as long_queries:
+            self.client.get(f"/{long_night}/?pin={long_night.pin}")
+
+        self.assertEqual(len(short_queries), len(long_queries))
+        self.assertLessEqual(len(long_queries), 4)
+
+    def test_reserve(self):
+        schedule = self.create_schedule(datetime.now(), 4)
+        slot = schedule.slots.first()
+        path = f"/{schedule}/slots/{slot.id}/reserve"
+
+        response = self.client.post(path, {"name": "TestDJ", "pin": schedule.pin})
+        self.assertEqual(response.status_code, 302)
+        slot.refresh_from_db()
+        self.assertEqual(slot.name, "TestDJ")
+        self.assertEqual(str(slot.slot_id), self.client.cookies["drummerei_slotId"].value)
+
+        self.client.cookies.clear()
+        response = self.client.post(path, {"name": "OtherDJ", "pin": schedule.pin})
+        self.assertEqual(response.status_code, 409)
+        slot.refresh_from_db()
+        self.assertEqual(slot.name, "TestDJ")
+
+        response = self.client.post(f"/{schedule}/slots/0/reserve", {"name": "TestDJ", "pin": schedule.pin})
+        self.assertEqual(response.status_code, 404)
+
+    def test_one_slot_per_visitor(self):
+        schedule = self.create_schedule(datetime.now(), 4)
+        first, second = schedule.slots.all()[1:3]
+        response = self.client.post(
+            f"/{schedule}/slots/{first.id}/reserve", {"name": "TestDJ", "pin": schedule.pin},
+        )
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.post(
+            f"/{schedule}/slots/{second.id}/reserve", {"name": "TestDJ", "pin": schedule.pin},
+        )
+        self.assertEqual(response.status_code, 409)
+        second.refresh_from_db()
+        self.assertIsNone(second.slot_id)
+
+        response = self.client.get(f"/{schedule}/?pin={schedule.pin}")
+        statuses = [status for _, status in response.context["rows"]]
+        self.assertEqual(statuses.count("own"), 1)
+        self.assertNotIn("available", statuses)
+        self.assertEqual(response.context["held_slot"], first)
+
+        response = self.client.get(f"/{schedule}/slots/{second.id}/?pin={schedule.pin}")
+        self.assertContains(response, "LOCKED")
+        self.assertNotContains(response, "RESERVE")
+
+    def test_not_modified(self):
+        schedule = self.create_schedule(datetime.now(), 4)
+        path = f"/{schedule}/"
+        self.client.cookies["drummerei_slotId"] = str(uuid4())
+        etag = self.client.get(path)["ETag"]
+
+        Settings.cached() # warm up the settings snapshot
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(queries), 2)
+        self.assertFalse(any("drummerei_slot" in query["sql"] for query in queries))
+
+        response = self.client.get(f"{path}?pin={schedule.pin}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+        schedule.slots.first().reserve("TestDJ")
+        response = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_invalid_dates_skip_database(self):
+        for path in ("/favicon.ico/", "/2025-13-01/", "/2025-1-1/"):
+            with self.assertNumQueries(0):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 404)
+
+    def test_date_is_stored(self):
+        schedule = self.create_schedule(datetime(2025, 1, 31, 20), 4)
+        self.assertEqual(str(schedule.date), "2025-01-31")
+        self.assertEqual(Schedule.objects.get(date="2025-01-31"), schedule)
+
+
+class HomeViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+
+    def create_schedules(self, weeks):
+        start_time = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+        return [
+            Schedule.objects.create(
+                start_time=start_time + timedelta(weeks=week),
+                end_time=start_time + timedelta(weeks=week, hours=4),
+            )
+            for week in weeks
+        ]
+
+    def test_upcoming_only(self):
+        past = self.create_schedules(range(-3, 0))
+        upcoming = self.create_schedules(reversed(range(HOME_SCHEDULE_COUNT + 2)))
+
+        response = self.client.get("/")
+        self.assertEqual(
+            list(response.context["schedules"]),
+            sorted(upcoming, key=lambda schedule: schedule.start_time)[:HOME_SCHEDULE_COUNT],
+        )
+        for schedule in past:
+            self.assertNotContains(response, f'href="/{schedule}"')
+
+    def test_cached_until_schedule_changes(self):
+        self.create_schedules([1])
+        self.client.get("/")
+        # only the cache key is read
+        with self.assertNumQueries(1):
+            self.client.get("/")
+
+        schedule, = self.create_schedules([2])
+        self.assertContains(self.client.get("/"), f'href="/{schedule}"')
+
+        schedule.delete()
+        self.assertNotContains(self.client.get("/"), f'href="/{schedule}"')
+
+    def test_writes_without_signals(self):
+        # like the writes of another process, which send no signals here
+        schedule, = self.create_schedules([1])
+        self.client.get("/")
+
+        start_time = schedule.start_time + timedelta(weeks=1)
+        created = Schedule(start_time=start_time, end_time=start_time + timedelta(hours=4))
+        created.date = created.event_date()
+        Schedule.objects.bulk_create([created])
+        self.assertContains(self.client.get("/"), f'href="/{created}"')
+
+        moved = schedule.start_time + timedelta(weeks=2)
+        Schedule.objects.filter(pk=schedule.pk).update(
+            start_time=moved, end_time=moved + timedelta(hours=4),
+            date=moved.date(), modified=timezone.now(),
+        )
+        schedule.refresh_from_db()
+        self.assertContains(self.client.get("/"), f'href="/{schedule}"')
+
+    def test_archive(self):
+        past = self.create_schedules(range(-ARCHIVE_PAGE_SIZE - 1, 0))
+        self.create_schedules([1])
+
+        page = self.client.get("/archive/").context["page"]
+        self.assertEqual(list(page), past[::-1][:ARCHIVE_PAGE_SIZE])
+        page = self.client.get("/archive/?page=2").context["page"]
+        self.assertEqual(list(page), past[:1])
+
+
+class ScheduleQRCodeViewTest(TestCase):
+    def setUp(self):
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create()
+
+    def test_svg(self):
+        response = self.client.get(f"/{self.schedule}/qr.svg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertTrue(response.content.startswith(b"<svg"))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_png(self):
+        response = self.client.get(f"/{self.schedule}/qr.png")
+        with Image.open(BytesIO(response.content)) as img:
+            self.assertEqual(img.format, "PNG")
+
+    def test_not_modified(self):
+        etag = self.client.get(f"/{self.schedule}/qr.svg")["ETag"]
+        response = self.client.get(f"/{self.schedule}/qr.svg", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_versioned_url(self):
+        etag = self.client.get(f"/{self.schedule}/qr.svg")["ETag"].strip('"')
+        response = self.client.get(f"/{self.schedule}/qr.svg?v={etag}")
+        self.assertIn("immutable", response["Cache-Control"])
+
+        self.schedule.pin += 1
+        self.schedule.save()
+        response = self.client.get(f"/{self.schedule}/qr.svg?v={etag}")
+        self.assertNotEqual(response["ETag"].strip('"'), etag)
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+    def test_cached(self):
+        self.client.get(f"/{self.schedule}/qr.png")
+        hits = qr.encode.cache_info().hits
+        self.client.get(f"/{self.schedule}/qr.png")
+        self.assertEqual(qr.encode.cache_info().hits, hits + 1)
+
+
+class SchedulePageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create(
+            start_time=datetime.now(),
+            end_time=datetime.now() + timedelta(hours=4),
+        )
+        self.path = f"/{self.schedule}/?pin={self.schedule.pin}"
+
+    def test_served_from_cache(self):
+        self.client.get(f"/{self.schedule}/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/{self.schedule}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("drummerei_slot" in query["sql"] for query in queries))
+
+    def test_invalidated_by_slot_write(self):
+        self.client.get(f"/{self.schedule}/")
+        self.schedule.slots.all()[1].reserve("TestDJ")
+        self.assertContains(self.client.get(f"/{self.schedule}/"), "TestDJ")
+
+    def test_csrf_token_per_visitor(self):
+        Client().get(self.path)
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(self.path)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())[1]
+
+        slot = self.schedule.slots.all()[1]
+        response = client.post(
+            f"/{self.schedule}/slots/{slot.id}/reserve",
+            {"name": "TestDJ", "pin": self.schedule.pin, "csrfmiddlewaretoken": token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_owner_is_not_cached(self):
+        slot = self.schedule.slots.all()[1]
+        slot_id = slot.reserve("TestDJ")
+        self.client.get(self.path)
+
+        self.client.cookies["drummerei_slotId"] = str(slot_id)
+        response = self.client.get(self.path)
+        self.assertIn("own", [status for _, status in response.context["rows"]])
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+
+
+class SlotRowCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = Settings.load()
+        self.settings.default_qr_code_path = "drummerei/static/image/test.png"
+        self.settings.save()
+        self.schedule = Schedule.objects.create(
+            start_time=datetime.now(),
+            end_time=datetime.now() + timedelta(hours=4),
+        )
+        self.path = f"/{self.schedule}/?pin={self.schedule.pin}"
+
+    def rendered_rows(self, response) -> int:
+        return [template.name for template in response.templates].count("components/slot/layout.html")
+
+    def test_only_changed_rows_are_rendered(self):
+        response = self.client.get(self.path)
+        self.assertEqual(self.rendered_rows(response), self.schedule.slots.count())
+
+        self.schedule.slots.all()[1].reserve("TestDJ")
+        response = self.client.get(self.path)
+        self.assertContains(response, "TestDJ")
+        self.assertEqual(self.rendered_rows(response), 1)
+
+    def test_csrf_token_injected(self):
+        slot = self.schedule.slots.all()[1]
+        self.client.get(self.path)
+
+        response = self.client.get(f"/{self.schedule}/slots/{slot.id}/?pin={self.schedule.pin}")
+        self.assertEqual(self.rendered_rows(response), 0)
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
@@ -1,16 +1,27 @@
-from django.urls import path
+from django.urls import path, register_converter
 
+from .converters import DateConverter
 from .views import (
+    archive,
     home,
     schedule,
     edit_slot,
     reserve_slot,
+    schedule_events,
+    schedule_qrcode,
+    slot_row,
 )
 
+register_converter(DateConverter, "date")
+
 urlpatterns = [
     path('', home),
-    #FIXME: favicon.ico is not found, only read date strings here
-    path('<str:date>/', schedule),
-    path('<str:date>/slots/<int:slot_id>/edit', edit_slot),
-    path('<str:date>/slots/<int:slot_id>/reserve', reserve_slot),
+    path('archive/', archive),
+    path('<date:date>/', schedule),
+    path('<date:date>/qr.png', schedule_qrcode, {"format": "png"}),
+    path('<date:date>/qr.svg', schedule_qrcode, {"format": "svg"}),
+    path('<date:date>/events', schedule_events),
+    path('<date:date>/slots/<int:slot_id>/', slot_row),
+    path('<date:date>/slots/<int:slot_id>/edit', edit_slot),
+    path('<date:date>/slots/<int:slot_id>/reserve', reserve_slot),
 ]
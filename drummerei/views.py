@@ -1,54 +1,316 @@
 import datetime
+import hashlib
 import uuid
 
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
 
+from drummerei import events, qr
 from drummerei.forms import ReserveSlotForm
 
 from .models.settings import Settings
 from .models.schedule import Schedule
+from .models.slot import Slot, SlotAlreadyHeld
+
+QR_CODE_MAX_AGE = 365 * 24 * 60 * 60
+
+SCHEDULE_PAGE_CACHE_TIMEOUT = 5 * 60
+
+SLOT_ROW_CACHE_TIMEOUT = 24 * 60 * 60
+
+CSRF_TOKEN_PLACEHOLDER = "drummerei-csrf-token-placeholder"
+
+HOME_SCHEDULE_COUNT = 10
+
+ARCHIVE_PAGE_SIZE = 20
+
+
+def start_of_today() -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+
+
+def home_page_cache_key(today:datetime.datetime) -> str:
+    """
+    Returns the cache key of the home page.
+
+    The key holds the number of upcoming schedules and their latest
+    modification time, read with one query. Every worker process notices a
+    created, changed or deleted schedule with its next request, no matter
+    which process wrote it.
+    """
+    upcoming = Schedule.objects.filter(start_time__gte=today).aggregate(
+        count=Count('id'), modified=Max('modified'),
+    )
+    modified = upcoming['modified'].timestamp() if upcoming['modified'] else 0
+    return f"drummerei:home:{today.date()}:{upcoming['count']}:{modified}"
+
 
 def home(request) -> HttpResponse:
+    """
+    Lists the next schedules, starting with tonight's.
+
+    The page has no per-visitor content, so it is rendered once and cached
+    until a schedule changes or the day ends.
+    """
+    today = start_of_today()
+    key = home_page_cache_key(today)
+    content = cache.get(key)
+    if content is None:
+        context = {
+            'schedules': Schedule.objects.filter(start_time__gte=today)
+                .order_by('start_time', 'id')[:HOME_SCHEDULE_COUNT],
+        }
+        content = render_to_string('pages/dates.html', context, request)
+        tomorrow = today + datetime.timedelta(days=1)
+        cache.set(key, content, (tomorrow - timezone.now()).total_seconds())
+    return HttpResponse(content)
+
+
+def archive(request) -> HttpResponse:
+    past = Schedule.objects.filter(start_time__lt=start_of_today()).order_by('-start_time', '-id')
     context = {
-        'schedules': Schedule.objects.all(),
+        'page': Paginator(past, ARCHIVE_PAGE_SIZE).get_page(request.GET.get('page')),
     }
-    return render(request, 'pages/dates.html', context)
+    return render(request, 'pages/archive.html', context)
 
 
-def create_context_for_schedule(date:str,pin:str,slotId:uuid.UUID) -> dict:
-    now =  datetime.datetime.now() + datetime.timedelta(hours=get_object_or_404(Schedule,start_time__date=date).unlock_hours)
+def visitor_id_from_cookies(request) -> uuid.UUID|None:
+    try:
+        return uuid.UUID(request.COOKIES['drummerei_slotId'])
+    except (KeyError, ValueError):
+        return None
+
+
+def is_kiosk(schedule:Schedule,pin:str|None) -> bool:
+    if pin and pin.isnumeric():
+        return int(pin) != schedule.pin
+    return True
+
+
+def slot_row_cache_key(schedule:Schedule,kiosk:bool,slot:Slot,status:Slot.Status) -> str:
+    """
+    Returns the cache key of a rendered slot row.
+
+    The key covers everything the row shows, so it changes exactly when the
+    row does and a cached row never has to be invalidated.
+    """
+    content = repr((kiosk, status.value, slot.name, slot.start_time, schedule.pin, str(schedule)))
+    return f"drummerei:slot:{slot.id}:{hashlib.sha256(content.encode()).hexdigest()[:32]}"
+
+
+def render_slot_rows(
+    schedule:Schedule,
+    kiosk:bool,
+    rows:list[tuple[Slot, Slot.Status]],
+) -> list[str]:
+    """
+    Renders slot rows, reusing the rows that didn't change since they were
+    last rendered.
+
+    All rows are looked up with one cache read and the missing ones stored
+    with one write, so after a reservation only the changed row is rendered.
+    Rows don't depend on the viewer, CSRF tokens are rendered as a placeholder,
+    see inject_csrf_token().
+
+    Returns:
+        list[str]: The HTML of the rows, in the order of the given rows.
+    """
+    keys = [slot_row_cache_key(schedule, kiosk, slot, status) for slot, status in rows]
+    rendered = cache.get_many(keys)
+    missing = {}
+    for key, (slot, status) in zip(keys, rows):
+        if key not in rendered:
+            missing[key] = render_to_string('components/slot/layout.html', {
+                "kiosk":kiosk,
+                "schedule":schedule,
+                "slot":slot,
+                "status":status,
+                "csrf_token":CSRF_TOKEN_PLACEHOLDER,
+            })
+    if missing:
+        cache.set_many(missing, SLOT_ROW_CACHE_TIMEOUT)
+        rendered.update(missing)
+    return [mark_safe(rendered[key]) for key in keys]
+
+
+def inject_csrf_token(request,content:str) -> str:
+    if CSRF_TOKEN_PLACEHOLDER in content:
+        content = content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request))
+    return content
+
+
+def create_context_for_schedule(
+    schedule:Schedule,
+    kiosk:bool,
+    held_slot:Slot|None,
+    now:datetime.datetime|None=None,
+) -> dict:
+    rows = schedule.slot_rows(held_slot=held_slot, now=now)
     context = {
-        "kiosk":True,
+        "kiosk":kiosk,
         # "range_add_slots":range(2),
-        "slot_id_from_cookies":slotId,
-        "site":Settings.load(),
-        # "now":datetime.datetime.now() + datetime.timedelta(hours=1)
-        "now":datetime.time(hour=now.hour,minute=now.minute),
-        "schedule":get_object_or_404(Schedule,start_time__date=date),
+        "held_slot":held_slot,
+        "site":Settings.cached(),
+        "schedule":schedule,
+        "rows":rows,
+        "row_html":render_slot_rows(schedule, kiosk, rows),
+        "qr_version":qr.content_hash(schedule.generate_url_with_pin(), "svg"),
     }
 
-    if pin:
-        if pin.isnumeric():
-            context["kiosk"] = int(pin) != context["schedule"].pin
-
     return context
 
 
-def schedule(request,date:str) -> HttpResponse:
+def schedule_page_cache_key(schedule:Schedule,kiosk:bool,now:datetime.datetime) -> str:
+    return ":".join((
+        "drummerei:schedule",
+        str(schedule.id),
+        str(schedule.version),
+        str(Settings.cached().version),
+        "kiosk" if kiosk else "visitor",
+        now.strftime("%Y%m%d%H%M"),
+    ))
+
+
+def render_cached_schedule_page(
+    request,
+    schedule:Schedule,
+    kiosk:bool,
+    now:datetime.datetime,
+) -> HttpResponse:
+    """
+    Renders the schedule page for viewers that don't hold a slot.
+
+    Those pages only differ by viewer role, so they are cached per schedule
+    version, settings version, role and minute. The lock state is computed for
+    the start of the minute, so a cached page never disagrees with a fresh one.
+    CSRF tokens are rendered as a placeholder and replaced per request.
+    """
+    key = schedule_page_cache_key(schedule, kiosk, now)
+    content = cache.get(key)
+    if content is None:
+        context = create_context_for_schedule(schedule, kiosk, None, now)
+        context["csrf_token"] = CSRF_TOKEN_PLACEHOLDER
+        content = render_to_string('pages/schedule.html', context, request)
+        cache.set(key, content, SCHEDULE_PAGE_CACHE_TIMEOUT)
+
+    return HttpResponse(inject_csrf_token(request, content))
+
+
+def schedule_page_etag(
+    schedule:Schedule,
+    kiosk:bool,
+    visitor_id:uuid.UUID|None,
+    now:datetime.datetime,
+) -> str:
+    """
+    Returns the ETag of the schedule page.
+
+    The page changes with the schedule, the settings and the lock states, which
+    are all part of the page cache key. Visitors additionally see their own
+    slot, so their id is part of the tag.
+    """
+    key = schedule_page_cache_key(schedule, kiosk, now)
+    if not kiosk:
+        key = f"{key}:{visitor_id}"
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def schedule(request,date:datetime.date) -> HttpResponse:
     slotId = request.COOKIES.get('drummerei_slotId')   
     if not slotId:
         slotId = uuid.uuid4()
 
-    context = create_context_for_schedule(date,request.GET.get("pin"),slotId)
+    schedule = get_object_or_404(Schedule,date=date)
+    kiosk = is_kiosk(schedule,request.GET.get("pin"))
+    visitor_id = visitor_id_from_cookies(request)
+    now = datetime.datetime.now().replace(second=0, microsecond=0)
+
+    # answer revalidations before rendering anything
+    etag = schedule_page_etag(schedule, kiosk, visitor_id, now)
+    last_modified = max(
+        schedule.modified,
+        timezone.now().replace(second=0, microsecond=0),
+    ).timestamp()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        held_slot = None if kiosk else schedule.slot_held_by(visitor_id)
+        if held_slot is None:
+            response = render_cached_schedule_page(request, schedule, kiosk, now)
+        else:
+            context = create_context_for_schedule(schedule,kiosk,held_slot,now)
+            response = HttpResponse(inject_csrf_token(
+                request, render_to_string('pages/schedule.html', context, request),
+            ))
+        response.set_cookie('drummerei_slotId', slotId)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie",))
+
+    return response
+
+def slot_row(request,date:datetime.date,slot_id:int) -> HttpResponse:
+    schedule = get_object_or_404(Schedule,date=date)
+    slot = get_object_or_404(schedule.slots,id=slot_id)
+    visitor_id = visitor_id_from_cookies(request)
+    if slot.slot_id is not None and slot.slot_id == visitor_id:
+        held_slot = slot
+    else:
+        held_slot = schedule.slot_held_by(visitor_id)
+    status = slot.get_status(slot_id=visitor_id, holds_slot=held_slot is not None)
+    [row] = render_slot_rows(schedule, is_kiosk(schedule,request.GET.get("pin")), [(slot, status)])
+    return HttpResponse(inject_csrf_token(request, row))
+
 
-    response = render(request, 'pages/schedule.html', context)
-    response.set_cookie('drummerei_slotId', slotId)
+async def schedule_events(request,date:datetime.date) -> HttpResponse:
+    if not isinstance(request, ASGIRequest):
+        # a stream would hold a worker thread per client under WSGI,
+        # 204 tells EventSource clients to stop reconnecting
+        return HttpResponse(status=204)
 
+    try:
+        schedule = await Schedule.objects.only("id").aget(date=date)
+    except Schedule.DoesNotExist:
+        raise Http404("Schedule not found")
+
+    try:
+        last_event_id = int(request.headers["Last-Event-ID"])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        events.stream(schedule.id, last_event_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
     return response
 
-def edit_slot(request,date:str,slot_id:int) -> HttpResponse|JsonResponse:
-    schedule = get_object_or_404(Schedule,start_time__date=date)
+
+def edit_slot(request,date:datetime.date,slot_id:int) -> HttpResponse|JsonResponse:
+    schedule = get_object_or_404(Schedule,date=date)
     form = ReserveSlotForm(request.POST)
     if form.is_valid():
         if schedule.pin == form.cleaned_data["pin"]:
@@ -67,19 +329,45 @@ def edit_slot(request,date:str,slot_id:int) -> HttpResponse|JsonResponse:
     else:
         return JsonResponse({"error": "Invalid PIN"}, status=401)
 
-def reserve_slot(request,date:str,slot_id:int) -> HttpResponse|JsonResponse:
+def reserve_slot(request,date:datetime.date,slot_id:int) -> HttpResponse|JsonResponse:
     form = ReserveSlotForm(request.POST)
     if form.is_valid():
-        schedule = get_object_or_404(Schedule,start_time__date=date)
+        schedule = get_object_or_404(Schedule,date=date)
         if schedule.pin == form.cleaned_data["pin"]:
-            slot = schedule.slots.get(id=slot_id)
-            slot.name = request.POST.get("name")
-            slot.slot_id = request.COOKIES.get('drummerei_slotId')
-            slot.save()
-            return HttpResponseRedirect(
+            slotId = visitor_id_from_cookies(request) or uuid.uuid4()
+            slots = schedule.slots.filter(id=slot_id)
+            try:
+                reserved = slots.reserve(form.cleaned_data["name"], slotId)
+            except SlotAlreadyHeld:
+                return JsonResponse({"error": "You already hold a slot"}, status=409)
+            if not reserved:
+                if not slots.exists():
+                    raise Http404("Slot not found")
+                return JsonResponse({"error": "Slot is already reserved"}, status=409)
+
+            response = HttpResponseRedirect(
                 redirect_to=f"/{date}?pin={request.POST.get("pin")}"
             )
+            response.set_cookie('drummerei_slotId', slotId)
+            return response
         else:
             return JsonResponse({"error": "Invalid PIN"}, status=401)
     else:
         return JsonResponse({"error": "Invalid form data"}, status=400)
+
+def schedule_qrcode(request,date:datetime.date,format:str) -> HttpResponse:
+    schedule = get_object_or_404(Schedule,date=date)
+    data = schedule.generate_url_with_pin()
+    etag = qr.content_hash(data, format)
+
+    response = get_conditional_response(request, etag=f'"{etag}"')
+    if response is None:
+        response = HttpResponse(qr.encode(data, format), content_type=qr.CONTENT_TYPES[format])
+    response["ETag"] = f'"{etag}"'
+
+    # versioned URLs change whenever the PIN changes, so they can be cached forever
+    if request.GET.get("v") == etag:
+        patch_cache_control(response, public=True, max_age=QR_CODE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response